@@ -0,0 +1 @@
+"""Benchmarks of the Miitown integration, for fleets of 10 to 10,000 devices."""
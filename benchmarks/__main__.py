@@ -0,0 +1,57 @@
+"""Run the benchmarks, and compare them with or update the baseline.
+
+    python -m benchmarks [--sizes 10 100 1000 10000] [--only NAME ...]
+                         [--check | --update-baseline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from .baseline import BASELINE_PATH, load_baseline, regressions
+from .suite import BENCHMARKS, SIZES, run
+
+
+def main() -> int:
+    """Run the benchmarks and print their metrics."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--check", action="store_true", help="fail on a regression from the baseline"
+    )
+    group.add_argument(
+        "--update-baseline", action="store_true", help="store the results as baseline"
+    )
+    args = parser.parse_args()
+
+    results = run(args.only, tuple(args.sizes))
+    for name, by_size in results.items():
+        for size, metrics in by_size.items():
+            values = "  ".join(f"{key}={value:.3f}" for key, value in metrics.items())
+            print(f"{name:<16} {size:>6}  {values}")
+
+    if args.update_baseline:
+        baseline = load_baseline()
+        for name, by_size in results.items():
+            baseline["results"].setdefault(name, {}).update(
+                {
+                    size: {key: round(value, 4) for key, value in metrics.items()}
+                    for size, metrics in by_size.items()
+                }
+            )
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated: {BASELINE_PATH}")
+    elif args.check:
+        if failed := regressions(results, load_baseline()):
+            print("\n".join(failed), file=sys.stderr)
+            return 1
+        print("No regression from the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Baseline the benchmarks are checked against."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Multiplies the tolerances of the timings, for slow or busy machines.
+TOLERANCE_SCALE = float(os.environ.get("MIITOWN_BENCH_TOLERANCE", "1"))
+
+
+def load_baseline() -> dict[str, Any]:
+    """Load the baseline: tolerance by metric suffix and name: size: metrics."""
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def tolerance(baseline: dict[str, Any], metric: str) -> float:
+    """Return how many times its baseline a metric may be."""
+    suffix = metric.rsplit("_", 1)[-1]
+    if suffix != "ms":
+        return baseline["tolerance"][suffix]
+    return baseline["tolerance"][suffix] * TOLERANCE_SCALE
+
+
+def regressions(
+        results: dict[str, dict[str, dict[str, float]]], baseline: dict[str, Any]
+) -> list[str]:
+    """Return a line for every metric above its baseline times its tolerance.
+
+    Metrics without a baseline aren't checked.
+    """
+    failed = []
+    for name, by_size in results.items():
+        for size, metrics in by_size.items():
+            expected = baseline["results"].get(name, {}).get(size, {})
+            for metric, value in metrics.items():
+                if metric not in expected:
+                    continue
+                limit = expected[metric] * tolerance(baseline, metric)
+                if value > limit:
+                    failed.append(
+                        f"{name} ({size} devices) {metric}: {value:.3f}, "
+                        f"baseline {expected[metric]:.3f}, limit {limit:.3f}"
+                    )
+    return failed
@@ -0,0 +1,358 @@
+"""Benchmarks of the poll path, run against generated fleets.
+
+Every benchmark takes a fleet size and returns its metrics, all of them lower is
+better: timings in milliseconds ("ms" suffix), memory in KiB ("kib" suffix) and
+entity state writes ("writes" suffix).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from functools import partial
+import json
+import logging
+import math
+import random
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import aiohttp
+from pytest_homeassistant_custom_component.common import (
+    async_test_home_assistant,
+    mock_storage,
+)
+
+from homeassistant import loader
+from homeassistant.core import State
+
+from custom_components.miitown.const import (
+    CONF_ACTIVE_INTERVAL,
+    CONF_CONNECTION_TIMEOUT,
+    CONF_IDLE_INTERVAL,
+    CONF_STOP_TIME,
+    DOMAIN,
+)
+from custom_components.miitown.coordinator import (
+    device_profile,
+    merge_status,
+    update_device,
+)
+from custom_components.miitown.http_helper import _decode_if_changed
+from custom_components.miitown.miitown_api import MiitownApi
+from custom_components.miitown.utils import distance, index_device_metas
+from custom_components.miitown.zones import ZoneIndex
+from tests import setup_entry
+from tests.replay_server import CENTER, SPREAD, ReplayServer, generate_fleet
+
+SIZES = (10, 100, 1000, 10000)
+# Zones set up in Home Assistant for the zone benchmark.
+ZONE_COUNT = 500
+# Thresholds of the default options.
+PROFILE = device_profile({})
+# Repeats of each timing, the best one counts.
+REPEAT = 5
+
+Benchmark = Callable[[int], dict[str, float]]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    """Register a benchmark."""
+
+    def register(func: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def best_time(func: Callable[[], object], size: int, repeat: int = REPEAT) -> float:
+    """Return the best time of func in milliseconds.
+
+    Small fleets are timed over many calls, to stay above the timer resolution.
+    """
+    calls = max(1, 10000 // size)
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best * 1000
+
+
+def merge(
+        devices: list[dict],
+        records: dict,
+        prev_metas: dict,
+        metas: list[dict],
+        now: int,
+        full_update: bool,
+) -> tuple[dict, dict]:
+    """Merge a status payload, with the default options."""
+    return merge_status(devices, records, prev_metas, metas, now, full_update, PROFILE)
+
+
+def _records(devices: list[dict], metas: list[dict], now: int) -> dict:
+    """Return the device records of a fleet after a first poll."""
+    changes, _ = merge(devices, {}, {}, metas, now, True)
+    return {serial: record for serial, record in changes.items() if record}
+
+
+@benchmark("index")
+def bench_index(size: int) -> dict[str, float]:
+    """Index the status records by IMEI and serial number."""
+    _, metas = generate_fleet(size)
+    return {"ms": best_time(lambda: index_device_metas(metas), size)}
+
+
+@benchmark("merge_full")
+def bench_merge_full(size: int) -> dict[str, float]:
+    """Build the device records from a full status payload."""
+    devices, metas = generate_fleet(size)
+    now = int(time.time())
+    tracemalloc.start()
+    records = _records(devices, metas, now)
+    kib = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    del records
+    return {
+        "ms": best_time(lambda: merge(devices, {}, {}, metas, now, True), size),
+        "records_kib": kib,
+    }
+
+
+@benchmark("merge_moved")
+def bench_merge_moved(size: int) -> dict[str, float]:
+    """Update the device records in place after 1% of the devices moved."""
+    devices, metas = generate_fleet(size)
+    now = int(time.time())
+    records = _records(devices, metas, now)
+    _, prev_metas = merge(devices, records, {}, metas, now, True)
+    moved = [dict(meta) for meta in metas]
+    for meta in random.Random(1).sample(moved, max(1, size // 100)):
+        if "position" in meta:
+            meta["position"] = {**meta["position"], "gpsTime": now}
+    return {
+        "ms": best_time(
+            lambda: merge(devices, records, prev_metas, moved, now, False),
+            size,
+        )
+    }
+
+
+@benchmark("merge_unchanged")
+def bench_merge_unchanged(size: int) -> dict[str, float]:
+    """Go through a status payload equal to the previous one."""
+    devices, metas = generate_fleet(size)
+    now = int(time.time())
+    records = _records(devices, metas, now)
+    _, prev_metas = merge(devices, records, {}, metas, now, True)
+    return {
+        "ms": best_time(
+            lambda: merge(devices, records, prev_metas, metas, now, False),
+            size,
+        )
+    }
+
+
+@benchmark("decode")
+def bench_decode(size: int) -> dict[str, float]:
+    """Decode a status body, and tell a repeated one apart without decoding it."""
+    _, metas = generate_fleet(size)
+    body = json.dumps({"code": 200, "data": metas}).encode()
+    digest, _ = _decode_if_changed(body, None)
+    return {
+        "ms": best_time(lambda: _decode_if_changed(body, None), size),
+        "unchanged_ms": best_time(lambda: _decode_if_changed(body, digest), size),
+    }
+
+
+@benchmark("derive")
+def bench_derive(size: int) -> dict[str, float]:
+    """Derive the battery level and flags of every device in place."""
+    devices, metas = generate_fleet(size)
+    now = int(time.time())
+    records = _records(devices, metas, now)
+    index = index_device_metas(metas)
+    pairs = [
+        (records[device["serialNumber"]], device, index[device["imei"]][1])
+        for device in devices
+        if device["serialNumber"] in records and device["imei"] in index
+    ]
+
+    def derive() -> None:
+        for record, device, meta in pairs:
+            update_device(record, device, meta, now, PROFILE)
+
+    return {"ms": best_time(derive, size)}
+
+
+def zone_states(count: int = ZONE_COUNT, seed: int = 0) -> list[State]:
+    """Return zone states spread over the fleet area."""
+    rnd = random.Random(seed)
+    return [
+        State(
+            f"zone.zone_{index}",
+            "0",
+            {
+                "latitude": CENTER[0] + rnd.uniform(-SPREAD, SPREAD),
+                "longitude": CENTER[1] + rnd.uniform(-SPREAD, SPREAD),
+                "radius": rnd.uniform(50, 2000),
+                "passive": False,
+                "friendly_name": f"Zone {index}",
+            },
+        )
+        for index in range(count)
+    ]
+
+
+@benchmark("zones")
+def bench_zones(size: int) -> dict[str, float]:
+    """Find the zone of every device, with the grid index and by a linear scan."""
+    _, metas = generate_fleet(size)
+    positions = [
+        (meta["position"]["lat"], meta["position"]["lng"])
+        for meta in metas
+        if "position" in meta
+    ]
+    states = zone_states()
+    zones = ZoneIndex()
+    for state in states:
+        zones.async_update(state.entity_id, state)
+    attributes = [state.attributes for state in states]
+
+    def indexed() -> None:
+        for latitude, longitude in positions:
+            zones.active_zone(latitude, longitude)
+
+    def linear() -> None:
+        for latitude, longitude in positions:
+            for zone in attributes:
+                distance(latitude, longitude, zone["latitude"], zone["longitude"])
+
+    # The linear scan is only there for comparison, once is enough.
+    return {"ms": best_time(indexed, size), "linear_ms": best_time(linear, size, 1)}
+
+
+async def _async_bench_poll(size: int) -> dict[str, float]:
+    server = ReplayServer(*generate_fleet(size), etag=False)
+    await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            api = MiitownApi(
+                session, None, "user", "password", server.url, coalesce_window=0
+            )
+            await api.authentication("user", "password")
+            devices = await api.fetch_devices()
+            await api.fetch_devices_data(True)
+            now = int(time.time())
+            records = _records(devices, server.metas, now)
+            _, prev_metas = merge(devices, records, {}, server.metas, now, True)
+
+            async def poll() -> float:
+                start = time.perf_counter()
+                if (metas := await api.fetch_devices_data(True)) is not None:
+                    merge(devices, records, prev_metas, metas, now, False)
+                return time.perf_counter() - start
+
+            unchanged = changed = math.inf
+            for _ in range(REPEAT):
+                unchanged = min(unchanged, await poll())
+                server.move(0.01, now)
+                changed = min(changed, await poll())
+    finally:
+        await server.stop()
+    return {"changed_ms": changed * 1000, "unchanged_ms": unchanged * 1000}
+
+
+@benchmark("poll")
+def bench_poll(size: int) -> dict[str, float]:
+    """Poll the replay server and merge the status, after 1% moved and unchanged."""
+    return asyncio.run(_async_bench_poll(size))
+
+
+async def _async_bench_tick(size: int) -> dict[str, float]:
+    server = ReplayServer(*generate_fleet(size))
+    await server.start()
+    with mock_storage(), patch(
+        "custom_components.miitown.coordinator.MiitownApi",
+        partial(MiitownApi, base_url=server.url, coalesce_window=0),
+    ), patch("custom_components.miitown.coordinator.REQUEST_JITTER", 0):
+        hass = await async_test_home_assistant(asyncio.get_running_loop())
+        # Load the integration from this repository.
+        hass.data.pop(loader.DATA_CUSTOM_COMPONENTS)
+        try:
+            # Only the benchmark polls, and no connection or trip times out while
+            # it runs, so the writes don't depend on how long it takes.
+            entry = await setup_entry(
+                hass,
+                {
+                    CONF_ACTIVE_INTERVAL: 3600,
+                    CONF_IDLE_INTERVAL: 3600,
+                    CONF_CONNECTION_TIMEOUT: 86400,
+                    CONF_STOP_TIME: 3600,
+                },
+            )
+            coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+            writes = 0
+            async_set = hass.states.async_set
+
+            def count_write(*args, **kwargs) -> None:
+                nonlocal writes
+                writes += 1
+                async_set(*args, **kwargs)
+
+            hass.states.async_set = count_write
+
+            async def tick() -> tuple[float, int]:
+                nonlocal writes
+                writes = 0
+                start = time.perf_counter()
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+                return time.perf_counter() - start, writes
+
+            unchanged = changed = math.inf
+            for _ in range(REPEAT):
+                elapsed, unchanged_writes = await tick()
+                unchanged = min(unchanged, elapsed)
+                server.move(0.1)
+                elapsed, changed_writes = await tick()
+                changed = min(changed, elapsed)
+            await hass.config_entries.async_unload(entry.entry_id)
+        finally:
+            await hass.async_stop(force=True)
+            await server.stop()
+    return {
+        "changed_ms": changed * 1000,
+        "unchanged_ms": unchanged * 1000,
+        "changed_writes": changed_writes,
+        "unchanged_writes": unchanged_writes,
+    }
+
+
+@benchmark("tick")
+def bench_tick(size: int) -> dict[str, float]:
+    """Poll through the coordinator and its entities, after 10% moved and unchanged.
+
+    Counts the state writes of the last tick of each kind.
+    """
+    # Home Assistant doesn't log debug messages by default, test runs do.
+    logging.disable(logging.INFO)
+    try:
+        return asyncio.run(_async_bench_tick(size))
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def run(
+        names: list[str] | None = None, sizes: tuple[int, ...] = SIZES
+) -> dict[str, dict[str, dict[str, float]]]:
+    """Run benchmarks, return name: size: metrics."""
+    return {
+        name: {str(size): BENCHMARKS[name](size) for size in sizes}
+        for name in names or BENCHMARKS
+    }
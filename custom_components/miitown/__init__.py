@@ -1,9 +1,11 @@
 """Miitown integration."""
 
 from __future__ import annotations
+import asyncio
 from dataclasses import dataclass, field
 from typing import Any
 
+import aiohttp
 import voluptuous as vol
 
 from homeassistant.components.device_tracker import CONF_SCAN_INTERVAL
@@ -11,19 +13,28 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     CONF_PASSWORD,
     CONF_USERNAME,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_STOP,
     Platform,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import Event, HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import ssl as ssl_util
 
+from . import http_helper
 from .const import (
     CONF_DRIVING_SPEED,
     DOMAIN,
+    MAX_CONCURRENT_REQUESTS,
 )
-from .coordinator import MiitownDataUpdateCoordinator
+from .coordinator import MiitownDataUpdateCoordinator, snapshot_store
+from .entity import async_release_devices
+from .history import async_setup_websocket
+from .utils import SharedProfiler
+from .zones import ZoneIndex, async_setup_zones
 
-PLATFORMS = [Platform.DEVICE_TRACKER]
+PLATFORMS = [Platform.BINARY_SENSOR, Platform.DEVICE_TRACKER, Platform.SENSOR]
 
 CONF_ACCOUNTS = "accounts"
 
@@ -58,15 +69,50 @@ class IntegrationData:
     )
     # serial_number: ConfigEntry.entry_id
     devices: dict[str, str] = field(init=False, default_factory=dict)
+    # Bumped whenever devices are released, so other entries claim them.
+    devices_version: int = field(init=False, default=0)
+    zones: ZoneIndex = field(init=False, default_factory=ZoneIndex)
+    # Bounds concurrent requests to miitown.com across all config entries.
+    request_semaphore: asyncio.Semaphore = field(
+        init=False, default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    )
+    # Profiler of the polls of the config entries with the profile_ticks option.
+    profiler: SharedProfiler = field(init=False, default_factory=SharedProfiler)
+    # Session of the config entries that don't share Home Assistant's.
+    session: aiohttp.ClientSession | None = field(init=False, default=None)
 
     def __post_init__(self):
         """Finish initialization of cfg_options."""
         self.cfg_options = self.cfg_options or {}
 
+    @callback
+    def async_get_session(self, hass: HomeAssistant) -> aiohttp.ClientSession:
+        """Return the dedicated session, creating it on first use."""
+        if self.session is None:
+            session = self.session = http_helper.create_session(
+                ssl_util.client_context()
+            )
+
+            async def _async_close_session(event: Event) -> None:
+                """Close the dedicated session."""
+                await session.close()
+
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+        return self.session
+
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up integration."""
     hass.data.setdefault(DOMAIN, IntegrationData(config.get(DOMAIN)))
+    async_setup_websocket(hass)
+    remove_zones_listener = async_setup_zones(hass, hass.data[DOMAIN].zones)
+
+    @callback
+    def _async_stop_zones(event: Event) -> None:
+        """Stop following zone changes."""
+        remove_zones_listener()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop_zones)
     return True
 
 
@@ -76,9 +122,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     coordinator = MiitownDataUpdateCoordinator(hass, entry)
 
-    await coordinator.async_config_entry_first_refresh()
+    if await coordinator.async_load_snapshot():
+        # Set up entities from the last run's data and refresh in the background.
+        hass.async_create_task(coordinator.async_refresh())
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data[DOMAIN].coordinators[entry.entry_id] = coordinator
+    # Entities listen per device, this passes each poll's changes on to them.
+    entry.async_on_unload(
+        coordinator.async_add_listener(coordinator.async_dispatch_updates)
+    )
+    entry.async_on_unload(entry.add_update_listener(coordinator.async_options_updated))
 
     # Set up components for our platforms.
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
@@ -91,10 +146,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     # Unload components for our platforms.
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        del hass.data[DOMAIN].coordinators[entry.entry_id]
-        # Remove any devices that were tracked by this entry.
-        for device_id, entry_id in hass.data[DOMAIN].devices.copy().items():
-            if entry_id == entry.entry_id:
-                del hass.data[DOMAIN].devices[device_id]
+        coordinator = hass.data[DOMAIN].coordinators.pop(entry.entry_id)
+        # Don't leave a scheduled save behind, it would outlive a removed entry.
+        await coordinator.async_save_snapshot()
+        # Hand the devices tracked by this entry over to other accounts with them.
+        async_release_devices(hass, entry)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot of a deleted config entry."""
+    await snapshot_store(hass, entry.entry_id).async_remove()
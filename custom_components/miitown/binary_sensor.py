@@ -0,0 +1,71 @@
+"""Support for Miitown binary sensors."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .entity import (
+    MiitownDeviceEntity,
+    MiitownEntityDescriptionMixin,
+    async_setup_device_entities,
+)
+
+
+@dataclass
+class MiitownBinarySensorEntityDescription(
+    BinarySensorEntityDescription, MiitownEntityDescriptionMixin
+):
+    """Describes a Miitown device binary sensor."""
+
+
+BINARY_SENSORS: tuple[MiitownBinarySensorEntityDescription, ...] = (
+    MiitownBinarySensorEntityDescription(
+        key="connected",
+        name="Connected",
+        device_class=BinarySensorDeviceClass.CONNECTIVITY,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda device: device.is_connected,
+    ),
+    MiitownBinarySensorEntityDescription(
+        key="low_power",
+        name="Low power",
+        device_class=BinarySensorDeviceClass.BATTERY,
+        value_fn=lambda device: device.is_low_power,
+    ),
+)
+
+
+async def async_setup_entry(
+        hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the binary sensor platform."""
+    async_setup_device_entities(
+        hass,
+        entry,
+        async_add_entities,
+        lambda coordinator, device_id: [
+            MiitownBinarySensor(coordinator, device_id, description)
+            for description in BINARY_SENSORS
+        ],
+    )
+
+
+class MiitownBinarySensor(MiitownDeviceEntity, BinarySensorEntity):
+    """Binary sensor for a flag of a Miitown device."""
+
+    entity_description: MiitownBinarySensorEntityDescription
+
+    @property
+    def is_on(self) -> bool | None:
+        """Return the flag of the device."""
+        return self._value
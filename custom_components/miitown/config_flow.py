@@ -17,8 +17,27 @@ from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
 
 from .const import (
+    CONF_ACTIVE_INTERVAL,
     CONF_AUTHORIZATION,
+    CONF_BATTERY_MAX,
+    CONF_BATTERY_MIN,
+    CONF_CONNECTION_TIMEOUT,
+    CONF_COORDINATE_DIGITS,
+    CONF_DEDICATED_SESSION,
     CONF_DRIVING_SPEED,
+    CONF_GPS_TOLERANCE,
+    CONF_IDLE_INTERVAL,
+    CONF_IDLE_TIME,
+    CONF_LOW_BATTERY,
+    CONF_MAX_WRITE_AGE,
+    CONF_MEASURE_LOOP_LAG,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_OFFLOAD_THRESHOLD,
+    CONF_PROFILE_TICKS,
+    CONF_SPEED_TOLERANCE,
+    CONF_STOP_SPEED,
+    CONF_STOP_TIME,
+    CONF_TRACK_SIZE,
     DEFAULT_OPTIONS,
     DOMAIN,
     LOGGER,
@@ -148,13 +167,20 @@ class MiitownOptionsFlow(OptionsFlow):
     ) -> FlowResult:
         """Handle account options."""
         options = self.config_entry.options
+        errors: dict[str, str] = {}
 
         if user_input is not None:
             new_options = _extract_account_options(user_input)
-            return self.async_create_entry(title="", data=new_options)
+            # battery_parse reads voltages within 5 of the maximum as full.
+            if new_options[CONF_BATTERY_MAX] - new_options[CONF_BATTERY_MIN] > 5:
+                return self.async_create_entry(title="", data=new_options)
+            errors["base"] = "battery_range"
+            options = new_options
 
         return self.async_show_form(
-            step_id="init", data_schema=vol.Schema(_account_options_schema(options))
+            step_id="init",
+            data_schema=vol.Schema(_account_options_schema(options)),
+            errors=errors,
         )
 
 
@@ -162,10 +188,71 @@ def _account_options_schema(options: Mapping[str, Any]) -> dict[vol.Marker, Any]
     """Create schema for account options form."""
     def_set_drive_speed = options[CONF_DRIVING_SPEED] is not None
     def_speed = options[CONF_DRIVING_SPEED] or vol.UNDEFINED
+    seconds = vol.All(vol.Coerce(int), vol.Range(min=1))
+    non_negative = vol.All(vol.Coerce(int), vol.Range(min=0))
+    tolerance = vol.All(vol.Coerce(float), vol.Range(min=0))
 
     return {
         vol.Required(SET_DRIVE_SPEED, default=def_set_drive_speed): bool,
         vol.Optional(CONF_DRIVING_SPEED, default=def_speed): vol.Coerce(float),
+        **{
+            vol.Required(key, default=options.get(key, DEFAULT_OPTIONS[key])): seconds
+            for key in (
+                CONF_ACTIVE_INTERVAL,
+                CONF_IDLE_INTERVAL,
+                CONF_IDLE_TIME,
+                CONF_STOP_TIME,
+                CONF_CONNECTION_TIMEOUT,
+            )
+        },
+        **{
+            vol.Required(key, default=options.get(key, DEFAULT_OPTIONS[key])): tolerance
+            for key in (CONF_STOP_SPEED, CONF_GPS_TOLERANCE, CONF_SPEED_TOLERANCE)
+        },
+        **{
+            vol.Required(
+                key, default=options.get(key, DEFAULT_OPTIONS[key])
+            ): non_negative
+            for key in (
+                CONF_MIN_WRITE_INTERVAL,
+                CONF_MAX_WRITE_AGE,
+                CONF_TRACK_SIZE,
+                CONF_BATTERY_MIN,
+                CONF_BATTERY_MAX,
+            )
+        },
+        vol.Required(
+            CONF_LOW_BATTERY,
+            default=options.get(CONF_LOW_BATTERY, DEFAULT_OPTIONS[CONF_LOW_BATTERY]),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+        vol.Required(
+            CONF_COORDINATE_DIGITS,
+            default=options.get(
+                CONF_COORDINATE_DIGITS, DEFAULT_OPTIONS[CONF_COORDINATE_DIGITS]
+            ),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=8)),
+        vol.Required(
+            CONF_DEDICATED_SESSION,
+            default=options.get(
+                CONF_DEDICATED_SESSION, DEFAULT_OPTIONS[CONF_DEDICATED_SESSION]
+            ),
+        ): bool,
+        vol.Required(
+            CONF_OFFLOAD_THRESHOLD,
+            default=options.get(
+                CONF_OFFLOAD_THRESHOLD, DEFAULT_OPTIONS[CONF_OFFLOAD_THRESHOLD]
+            ),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Required(
+            CONF_PROFILE_TICKS,
+            default=options.get(CONF_PROFILE_TICKS, DEFAULT_OPTIONS[CONF_PROFILE_TICKS]),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Required(
+            CONF_MEASURE_LOOP_LAG,
+            default=options.get(
+                CONF_MEASURE_LOOP_LAG, DEFAULT_OPTIONS[CONF_MEASURE_LOOP_LAG]
+            ),
+        ): bool,
     }
 
 
@@ -9,21 +9,85 @@ LOGGER = logging.getLogger(__package__)
 ATTRIBUTION = "Data provided by miitown.com"
 SPEED_DIGITS = 1
 UPDATE_INTERVAL = timedelta(seconds=10)
+DEVICES_REFRESH_INTERVAL = timedelta(minutes=30)
+
+# Positions kept per device for the track websocket command, by default.
+TRACK_SIZE = 1440
+# Positions kept for all devices of an account, about 40 MB; large accounts keep
+# shorter tracks.
+MAX_TRACK_POINTS = 1_000_000
+
+# Snapshot of the last good data, used to set up entities right away on startup.
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = timedelta(minutes=5)
+# Limits shared by all accounts, so many config entries don't hit the server at once.
+MAX_CONCURRENT_REQUESTS = 4
+REQUEST_JITTER = 2.0
+# Identical API calls within this many seconds share one request.
+COALESCE_WINDOW = 1.0
+# How often the event loop lag is sampled during a poll, in seconds, when measured.
+LOOP_LAG_INTERVAL = 0.01
 
 ATTR_IMEI = "imei"
-ATTR_IS_CONNECTED = "is_connected"
 ATTR_DRIVING = "driving"
-ATTR_LAST_SEEN = "last_seen"
-ATTR_IS_LOW_POWER = "is_low_power"
 ATTR_SPEED = "speed"
 ATTR_HEIGHT = "height"
-ATTR_SATELLITES = "satellites"
+ATTR_STALE = "stale"
+
+EVENT_ZONE_ENTER = f"{DOMAIN}_zone_enter"
+EVENT_ZONE_LEAVE = f"{DOMAIN}_zone_leave"
+EVENT_TRIP = f"{DOMAIN}_trip"
 
 CONF_AUTHORIZATION = "authorization"
 CONF_DRIVING_SPEED = "driving_speed"
+CONF_ACTIVE_INTERVAL = "active_interval"
+CONF_IDLE_INTERVAL = "idle_interval"
+CONF_IDLE_TIME = "idle_time"
+CONF_GPS_TOLERANCE = "gps_tolerance"
+CONF_SPEED_TOLERANCE = "speed_tolerance"
+CONF_PROFILE_TICKS = "profile_ticks"
+CONF_MEASURE_LOOP_LAG = "measure_loop_lag"
+CONF_STOP_SPEED = "stop_speed"
+CONF_STOP_TIME = "stop_time"
+CONF_DEDICATED_SESSION = "dedicated_session"
+CONF_OFFLOAD_THRESHOLD = "offload_threshold"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_MAX_WRITE_AGE = "max_write_age"
+CONF_COORDINATE_DIGITS = "coordinate_digits"
+CONF_TRACK_SIZE = "track_size"
+CONF_BATTERY_MIN = "battery_min"
+CONF_BATTERY_MAX = "battery_max"
+CONF_LOW_BATTERY = "low_battery"
+CONF_CONNECTION_TIMEOUT = "connection_timeout"
+
+# A position fix younger than this (in seconds) counts as activity.
+ACTIVE_GPS_AGE = 120
+# A trip only starts on a position fix younger than this (in seconds), at or above
+# the driving speed option or this default.
+DRIVING_GPS_AGE = 60
+DEFAULT_DRIVING_SPEED = 3.0
 
 DEFAULT_OPTIONS = {
     CONF_DRIVING_SPEED: None,
+    CONF_ACTIVE_INTERVAL: int(UPDATE_INTERVAL.total_seconds()),
+    CONF_IDLE_INTERVAL: 300,
+    CONF_IDLE_TIME: 900,
+    CONF_GPS_TOLERANCE: 5.0,
+    CONF_SPEED_TOLERANCE: 1.0,
+    CONF_PROFILE_TICKS: 0,
+    CONF_MEASURE_LOOP_LAG: False,
+    CONF_STOP_SPEED: 1.0,
+    CONF_STOP_TIME: 180,
+    CONF_DEDICATED_SESSION: False,
+    CONF_OFFLOAD_THRESHOLD: 1000,
+    CONF_MIN_WRITE_INTERVAL: 0,
+    CONF_MAX_WRITE_AGE: 0,
+    CONF_COORDINATE_DIGITS: 5,
+    CONF_TRACK_SIZE: TRACK_SIZE,
+    CONF_BATTERY_MIN: 340,
+    CONF_BATTERY_MAX: 410,
+    CONF_LOW_BATTERY: 20,
+    CONF_CONNECTION_TIMEOUT: 900,
 }
 
 OPTIONS = list(DEFAULT_OPTIONS.keys())
@@ -2,32 +2,93 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from datetime import datetime
+import asyncio
+from collections import defaultdict
+import math
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timedelta
+import random
+import time
+from collections.abc import Awaitable, Callable, Mapping
 from typing import Any
 
+from aiohttp import ClientSession
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.json import JSONEncoder
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 import homeassistant.util.dt as dt_util
 
 from .const import (
+    ACTIVE_GPS_AGE,
+    CONF_ACTIVE_INTERVAL,
     CONF_AUTHORIZATION,
+    CONF_BATTERY_MAX,
+    CONF_BATTERY_MIN,
+    CONF_CONNECTION_TIMEOUT,
+    CONF_DEDICATED_SESSION,
+    CONF_DRIVING_SPEED,
+    CONF_IDLE_INTERVAL,
+    CONF_IDLE_TIME,
+    CONF_LOW_BATTERY,
+    CONF_MEASURE_LOOP_LAG,
+    CONF_OFFLOAD_THRESHOLD,
+    CONF_PROFILE_TICKS,
+    CONF_STOP_SPEED,
+    CONF_STOP_TIME,
+    CONF_TRACK_SIZE,
+    DEFAULT_DRIVING_SPEED,
+    DEFAULT_OPTIONS,
+    DEVICES_REFRESH_INTERVAL,
     DOMAIN,
+    EVENT_TRIP,
     LOGGER,
+    LOOP_LAG_INTERVAL,
+    MAX_TRACK_POINTS,
+    REQUEST_JITTER,
+    SNAPSHOT_SAVE_DELAY,
     SPEED_DIGITS,
+    STORAGE_VERSION,
     UPDATE_INTERVAL,
 )
+from .history import DeviceTrack
 from .miitown_api import MiitownApi
-from .utils import AuthError
+from .transport import PollingTransport, StatusTransport
+from .trips import TripDetector
+from .utils import (
+    AuthError,
+    DeviceProfile,
+    RollingStats,
+    battery_parse,
+    index_device_metas,
+)
 
 
 @dataclass
 class MiitownDevice:
     """Miitown Device data."""
 
+    __slots__ = (
+        "imei",
+        "name",
+        "last_seen",
+        "is_connected",
+        "battery_level",
+        "is_low_power",
+        "is_driving",
+        "latitude",
+        "longitude",
+        "height",
+        "satellites",
+        "speed",
+        "gps_time",
+    )
+
     imei: str
     name: str
     last_seen: datetime
@@ -40,6 +101,7 @@ class MiitownDevice:
     height: float
     satellites: int
     speed: float
+    gps_time: int
 
 
 @dataclass
@@ -49,6 +111,170 @@ class MiitownData:
     devices: dict[str, MiitownDevice] = field(init=False, default_factory=dict)
 
 
+def device_profile(options: Mapping[str, Any]) -> DeviceProfile:
+    """Return the device thresholds set in the options of a config entry."""
+    return DeviceProfile(
+        *(
+            options.get(key, DEFAULT_OPTIONS[key])
+            for key in (
+                CONF_BATTERY_MIN,
+                CONF_BATTERY_MAX,
+                CONF_LOW_BATTERY,
+                CONF_CONNECTION_TIMEOUT,
+            )
+        )
+    )
+
+
+def update_device(
+        record: MiitownDevice | None,
+        device: dict,
+        meta: dict,
+        time_now: int,
+        profile: DeviceProfile,
+) -> MiitownDevice | None:
+    """Create or update in place the record of a device from its status record.
+
+    Returns None if the status record has no connection or position.
+    """
+    ids = (device["imei"], device["serialNumber"])
+    conn = meta.get("conn")
+    position = meta.get("position")
+    if conn is None or conn["imei"] not in ids:
+        return None
+    if position is None or position["imei"] not in ids:
+        return None
+
+    battery_level = 0
+    is_low_power = False
+    power = meta.get("power")
+    if power is not None and power["imei"] in ids:
+        if power["po"] != 1:
+            battery_level = battery_parse(
+                power["inside"], profile.battery_min, profile.battery_max
+            )
+            is_low_power = battery_level <= profile.low_battery
+        else:
+            battery_level = 100
+
+    if record is None:
+        return MiitownDevice(
+            device["imei"],
+            device["displayName"],
+            dt_util.utc_from_timestamp(conn["connTime"]),
+            time_now - conn["connTime"] <= profile.connection_timeout,
+            battery_level,
+            is_low_power,
+            # Set by the trip detector.
+            False,
+            float(position["lat"]),
+            float(position["lng"]),
+            float(position["high"]),
+            int(position["sates"]),
+            round(position["speed"], SPEED_DIGITS),
+            position["gpsTime"],
+        )
+
+    record.imei = device["imei"]
+    record.name = device["displayName"]
+    record.battery_level = battery_level
+    record.is_low_power = is_low_power
+
+    last_seen = dt_util.utc_from_timestamp(conn["connTime"])
+    if last_seen < record.last_seen:
+        LOGGER.warning(
+            "%s: Ignoring location update because "
+            "last_seen (%s) < previous last_seen (%s)",
+            record.name,
+            last_seen,
+            record.last_seen,
+        )
+        return record
+
+    record.last_seen = last_seen
+    record.is_connected = time_now - conn["connTime"] <= profile.connection_timeout
+    record.latitude = float(position["lat"])
+    record.longitude = float(position["lng"])
+    record.height = float(position["high"])
+    record.satellites = int(position["sates"])
+    record.speed = round(position["speed"], SPEED_DIGITS)
+    record.gps_time = position["gpsTime"]
+    return record
+
+
+def expire_device(
+        record: MiitownDevice, time_now: int, profile: DeviceProfile, copy: bool = False
+) -> MiitownDevice | None:
+    """Clear the connected flag once it got too old.
+
+    Used for devices whose status didn't change. Returns the record if the flag
+    changed, or with copy a changed copy of it.
+    """
+    if (
+            not record.is_connected
+            or time_now - record.last_seen.timestamp() <= profile.connection_timeout
+    ):
+        return None
+    if copy:
+        record = replace(record)
+    record.is_connected = False
+    return record
+
+
+def merge_status(
+        devices: list[dict],
+        records: Mapping[str, MiitownDevice],
+        prev_metas: Mapping[str, dict],
+        device_metas: list[dict],
+        time_now: int,
+        full_update: bool,
+        profile: DeviceProfile,
+        copy: bool = False,
+) -> tuple[dict[str, MiitownDevice | None], dict[str, dict]]:
+    """Work out the device records changed by a status payload.
+
+    Returns the changed records by serial number, None for devices that lost their
+    record, and the status record of each device. With copy, records are left
+    alone and changed ones are returned as copies, so this can run in the executor.
+    """
+    changes: dict[str, MiitownDevice | None] = {}
+    metas: dict[str, dict] = {}
+    index = index_device_metas(device_metas)
+    for device in devices:
+        serial_number = device["serialNumber"]
+        by_imei = index.get(device["imei"])
+        by_serial = index.get(serial_number)
+        # The first status record mentioning the device wins.
+        if by_imei is None or by_serial is not None and by_serial[0] < by_imei[0]:
+            by_imei = by_serial
+        record = records.get(serial_number)
+        if by_imei is None:
+            if record:
+                changes[serial_number] = None
+            continue
+
+        meta = metas[serial_number] = by_imei[1]
+        if not full_update and meta == prev_metas.get(serial_number):
+            if record and (expired := expire_device(record, time_now, profile, copy)):
+                changes[serial_number] = expired
+            continue
+
+        if copy and record:
+            record = replace(record)
+        if new_record := update_device(record, device, meta, time_now, profile):
+            changes[serial_number] = new_record
+        elif record:
+            changes[serial_number] = None
+
+    return changes, metas
+
+
+def snapshot_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store holding the snapshot of a config entry."""
+    # The encoder turns last_seen into an ISO string.
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}", encoder=JSONEncoder)
+
+
 class MiitownDataUpdateCoordinator(DataUpdateCoordinator[MiitownData]):
     """Miitown data update coordinator."""
 
@@ -64,46 +290,468 @@ class MiitownDataUpdateCoordinator(DataUpdateCoordinator[MiitownData]):
         )
         self._hass = hass
         self._api = MiitownApi(
-            session=async_get_clientsession(hass),
+            session=self._client_session(),
             authorization=entry.data[CONF_AUTHORIZATION],
+            username=entry.data[CONF_USERNAME],
+            password=entry.data[CONF_PASSWORD],
         )
+        self._transport: StatusTransport = PollingTransport(self._api)
         self._devices: list[dict] | None = None
+        # Monotonic time of the last device list fetch, -inf to fetch on the next poll.
+        self._devices_fetched = -math.inf
+        # Serial numbers of all devices on the account, per the device list.
+        self.serial_numbers: set[str] = set()
+        # serial_number: DeviceTrack
+        self.history: dict[str, DeviceTrack] = {}
+        # serial_number: TripDetector
+        self.trips: dict[str, TripDetector] = {}
+        # Serial numbers of the devices that changed in the last poll.
+        self.changed: set[str] = set()
+        # Bumped whenever devices appear in or disappear from the data.
+        self.device_set_version = 0
+        # serial_number: callbacks of the entities of that device
+        self._device_listeners: dict[str, list[CALLBACK_TYPE]] = {}
+        self._dispatched_state: tuple[bool, bool] | None = None
+        # serial_number: status record the device was last updated from
+        self._device_metas: dict[str, dict] = {}
+        # Set when the next poll must process the full status payload.
+        self._full_update = True
+        # Battery and connection thresholds the device records are updated with.
+        self._device_profile = device_profile(entry.options)
+        self._semaphore: asyncio.Semaphore = hass.data[DOMAIN].request_semaphore
+        # Start out polling fast until the first update says otherwise.
+        self._last_active = time.time()
+        # Number of entity state writes skipped because nothing changed.
+        self.suppressed_writes = 0
+        self._store = snapshot_store(hass, entry.entry_id)
+        self._snapshot_scheduled = -math.inf
+        # True while data is restored from the snapshot and not yet refreshed.
+        self.stale = False
+        # Timings of the stages of a poll, by stage name.
+        self.timings: defaultdict[str, RollingStats] = defaultdict(RollingStats)
+        # Polls profiled since the profile was last written.
+        self._profiled_ticks = 0
+
+    @property
+    def coalesced_calls(self) -> int:
+        """Return the number of API calls that shared another call's request."""
+        return self._api.coalesced
+
+    @callback
+    def async_add_device_listener(
+            self, serial_number: str, update_callback: CALLBACK_TYPE
+    ) -> Callable[[], None]:
+        """Listen for changes to the data of one device."""
+        listeners = self._device_listeners.setdefault(serial_number, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove device update listener."""
+            listeners.remove(update_callback)
+            if not listeners:
+                del self._device_listeners[serial_number]
+
+        return remove_listener
+
+    @callback
+    def async_dispatch_updates(self) -> None:
+        """Notify the listeners of the devices that changed in the last poll."""
+        state = (self.last_update_success, self.stale)
+        if state != self._dispatched_state:
+            # Availability or staleness changed, which affects every device.
+            self._dispatched_state = state
+            serial_numbers = list(self._device_listeners)
+        else:
+            serial_numbers = self.changed
+        for serial_number in serial_numbers:
+            for update_callback in self._device_listeners.get(serial_number, ()):
+                update_callback()
+
+    async def async_load_snapshot(self) -> bool:
+        """Restore the device list and data saved by a previous run."""
+        if not (snapshot := await self._store.async_load()):
+            return False
+        data = MiitownData()
+        try:
+            for serial_number, device in snapshot["data"].items():
+                device["last_seen"] = dt_util.parse_datetime(device["last_seen"])
+                data.devices[serial_number] = MiitownDevice(**device)
+            self._set_devices(snapshot["devices"])
+        except (KeyError, TypeError, ValueError) as exc:
+            LOGGER.debug("%s: ignoring bad snapshot: %s", self.name, exc)
+            return False
+
+        # Check the device list for changes on the first poll.
+        self._devices_fetched = -math.inf
+        self.data = data
+        self.stale = True
+        return True
+
+    def _snapshot(self) -> dict[str, Any]:
+        """Return the data to save for the next startup."""
+        return {
+            "devices": self._devices,
+            "data": {
+                serial_number: asdict(device)
+                for serial_number, device in self.data.devices.items()
+            },
+        }
+
+    def _save_snapshot(self) -> None:
+        """Schedule saving a snapshot, at most once per SNAPSHOT_SAVE_DELAY."""
+        delay = SNAPSHOT_SAVE_DELAY.total_seconds()
+        if time.monotonic() - self._snapshot_scheduled > delay:
+            self._snapshot_scheduled = time.monotonic()
+            self._store.async_delay_save(self._snapshot, delay)
+
+    async def async_save_snapshot(self) -> None:
+        """Save a snapshot now, instead of when scheduled."""
+        if self.data is not None:
+            await self._store.async_save(self._snapshot())
 
-    async def _retrieve_data(self, func: str, *args: Any) -> list[dict[str, Any]]:
+    async def _retrieve_data(
+            self, func: Callable[..., Awaitable[Any]], *args: Any
+    ) -> Any:
         """Get data from Miitown."""
+        stats = self.timings[func.__name__]
+        start = time.perf_counter()
         try:
-            return await getattr(self._api, func)(*args)
+            async with self._semaphore:
+                return await func(*args)
         except AuthError as exc:
+            stats.errors += 1
             LOGGER.debug("Login error: %s", exc)
             raise ConfigEntryAuthFailed from exc
         except Exception as exc:
+            stats.errors += 1
             LOGGER.debug("%s: %s", exc.__class__.__name__, exc)
             raise UpdateFailed from exc
+        finally:
+            stats.record(time.perf_counter() - start)
+            self._store_authorization()
+
+    def _store_authorization(self) -> None:
+        """Persist a token the API obtained by logging in again."""
+        authorization = self._api.authorization
+        if authorization and authorization != self.config_entry.data[CONF_AUTHORIZATION]:
+            LOGGER.debug("%s: storing refreshed authorization", self.name)
+            self.hass.config_entries.async_update_entry(
+                self.config_entry,
+                data={**self.config_entry.data, CONF_AUTHORIZATION: authorization},
+            )
+
+    def _set_devices(self, devices: list[dict]) -> None:
+        """Replace the cached device list."""
+        self._devices = devices
+        self._devices_fetched = time.monotonic()
+        self.serial_numbers = {device["serialNumber"] for device in devices}
+        # Also sizes the status timeout when the list comes from the snapshot.
+        self._api.set_device_count(len(devices))
+        self._full_update = True
+        self.device_set_version += 1
+        if self.data:
+            for serial_number in self.data.devices.keys() - self.serial_numbers:
+                del self.data.devices[serial_number]
+        for serial_number in self.history.keys() - self.serial_numbers:
+            del self.history[serial_number]
+        for serial_number in self.trips.keys() - self.serial_numbers:
+            del self.trips[serial_number]
+
+    async def _async_refresh_devices(self) -> None:
+        """Refresh the cached device list, keeping it if the fetch fails."""
+        try:
+            devices = await self._retrieve_data(self._api.fetch_devices)
+        except (ConfigEntryAuthFailed, UpdateFailed):
+            # Already logged, and the next status poll reports the problem.
+            return
+        if devices != self._devices:
+            LOGGER.debug("%s: device list changed", self.name)
+            self._set_devices(devices)
+
+    async def async_options_updated(
+            self, hass: HomeAssistant, entry: ConfigEntry
+    ) -> None:
+        """Update all device records when their thresholds changed."""
+        if (profile := device_profile(entry.options)) == self._device_profile:
+            return
+        self._device_profile = profile
+        # Parked devices keep their status record, so only a full update reaches them.
+        self._full_update = True
+        await self.async_request_refresh()
+
+    def _option(self, key: str) -> Any:
+        """Return a config entry option, falling back to its default."""
+        return self.config_entry.options.get(key, DEFAULT_OPTIONS[key])
+
+    def _track_size(self) -> int:
+        """Return the positions kept per device, within those kept per account."""
+        return min(
+            self._option(CONF_TRACK_SIZE),
+            MAX_TRACK_POINTS // max(len(self.serial_numbers), 1),
+        )
+
+    def _client_session(self) -> ClientSession:
+        """Return the session to use, per the dedicated session option."""
+        if self._option(CONF_DEDICATED_SESSION):
+            return self.hass.data[DOMAIN].async_get_session(self.hass)
+        return async_get_clientsession(self.hass)
+
+    def _adapt_update_interval(self, devices: dict[str, MiitownDevice]) -> None:
+        """Poll fast while any device is moving, back off once all are idle."""
+        time_now = time.time()
+        if any(
+                device.is_driving or time_now - device.gps_time <= ACTIVE_GPS_AGE
+                for device in devices.values()
+        ):
+            self._last_active = time_now
+
+        if time_now - self._last_active > self._option(CONF_IDLE_TIME):
+            update_interval = timedelta(seconds=self._option(CONF_IDLE_INTERVAL))
+        else:
+            update_interval = timedelta(seconds=self._option(CONF_ACTIVE_INTERVAL))
+
+        if update_interval != self.update_interval:
+            LOGGER.debug("%s: polling every %s", self.name, update_interval)
+            self.update_interval = update_interval
+
+    def _start_profile(self) -> bool:
+        """Profile this poll if requested through the options, return if it is."""
+        if not self._option(CONF_PROFILE_TICKS):
+            return False
+        if not self.hass.data[DOMAIN].profiler.start():
+            LOGGER.warning("%s: not profiling, another profiler is active", self.name)
+            return False
+        return True
+
+    def _stop_profile(self) -> None:
+        """Stop profiling, and write the profile once enough polls were seen."""
+        profiler = self.hass.data[DOMAIN].profiler
+        profiler.stop()
+        self._profiled_ticks += 1
+        if self._profiled_ticks < self._option(CONF_PROFILE_TICKS):
+            return
+        if (profile := profiler.take()) is None:
+            # Another account's poll is being profiled, try again after the next one.
+            return
+
+        path = self.hass.config.path(
+            f"{DOMAIN}_profile_{self.config_entry.entry_id}.prof"
+        )
+        self.hass.async_add_executor_job(profile.dump_stats, path)
+        LOGGER.info(
+            "%s: profile of %s polls written to %s", self.name, self._profiled_ticks, path
+        )
+        self._profiled_ticks = 0
+        # Profiling is a one-off, turn the option back off.
+        self.hass.config_entries.async_update_entry(
+            self.config_entry,
+            options={**self.config_entry.options, CONF_PROFILE_TICKS: 0},
+        )
 
     async def _async_update_data(self) -> MiitownData:
         """Get & process data from Miitown."""
 
-        data = MiitownData()
+        if self.data is not None:
+            # Spread the polls of many accounts instead of firing them together.
+            await asyncio.sleep(random.uniform(0, REQUEST_JITTER))
+
+        self.changed = set()
+        stats = self.timings["update"]
+        start = time.perf_counter()
+        profiling = False
+        lag_probe = None
+        if self._option(CONF_MEASURE_LOOP_LAG):
+            lag_probe = self.hass.async_create_task(self._async_measure_loop_lag())
+        try:
+            profiling = self._start_profile()
+            return await self._async_poll()
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            if lag_probe is not None:
+                lag_probe.cancel()
+            if profiling:
+                self._stop_profile()
+            stats.record(time.perf_counter() - start)
+
+    async def _async_measure_loop_lag(self) -> None:
+        """Record how late the event loop wakes up a sleeper, while polling."""
+        loop = asyncio.get_running_loop()
+        stats = self.timings["loop_lag"]
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            stats.record(loop.time() - start - LOOP_LAG_INTERVAL)
+
+    async def _async_update_devices(
+            self,
+            data: MiitownData,
+            device_metas: list[dict],
+            time_now: int,
+            full_update: bool,
+    ) -> set[str]:
+        """Update device records from the status payload.
+
+        Returns the serial numbers of the devices that changed.
+        """
+        if 0 < self._option(CONF_OFFLOAD_THRESHOLD) < len(self._devices):
+            changes, self._device_metas = await self.hass.async_add_executor_job(
+                merge_status,
+                self._devices,
+                dict(data.devices),
+                self._device_metas,
+                device_metas,
+                time_now,
+                full_update,
+                self._device_profile,
+                True,
+            )
+        else:
+            changes, self._device_metas = merge_status(
+                self._devices,
+                data.devices,
+                self._device_metas,
+                device_metas,
+                time_now,
+                full_update,
+                self._device_profile,
+            )
+
+        changed = set()
+        device_set_changed = False
+        track_size = self._track_size()
+        if not track_size:
+            self.history.clear()
+        for serial_number, record in changes.items():
+            if serial_number not in self.serial_numbers:
+                # Removed from the account while the payload was processed.
+                continue
+            changed.add(serial_number)
+            if record is None:
+                data.devices.pop(serial_number, None)
+                device_set_changed = True
+                continue
+            if serial_number not in data.devices:
+                device_set_changed = True
+            data.devices[serial_number] = record
+            if not track_size:
+                continue
+            if (track := self.history.get(serial_number)) is None:
+                track = self.history[serial_number] = DeviceTrack(track_size)
+            elif track.size != track_size:
+                track = self.history[serial_number] = track.resized(track_size)
+            track.append(
+                record.gps_time,
+                record.latitude,
+                record.longitude,
+                record.speed,
+                record.height,
+            )
+
+        if device_set_changed:
+            self.device_set_version += 1
+        return changed
+
+    def _update_trips(
+            self, devices: dict[str, MiitownDevice], time_now: int
+    ) -> set[str]:
+        """Run the trip detection of all devices and fire events for ended trips.
+
+        Sets the driving flag of the devices. Returns the serial numbers of the
+        devices whose flag changed.
+        """
+        changed = set()
+        if (start_speed := self._option(CONF_DRIVING_SPEED)) is None:
+            start_speed = DEFAULT_DRIVING_SPEED
+        stop_speed = self._option(CONF_STOP_SPEED)
+        stop_time = self._option(CONF_STOP_TIME)
+        for serial_number, device in devices.items():
+            if not (detector := self.trips.get(serial_number)):
+                detector = self.trips[serial_number] = TripDetector()
+            trip = detector.update(
+                device.gps_time,
+                device.latitude,
+                device.longitude,
+                device.speed,
+                time_now,
+                start_speed,
+                stop_speed,
+                stop_time,
+            )
+            if device.is_driving != (detector.trip is not None):
+                device.is_driving = not device.is_driving
+                changed.add(serial_number)
+            if trip:
+                self.hass.bus.async_fire(
+                    EVENT_TRIP,
+                    {
+                        "serial_number": serial_number,
+                        "imei": device.imei,
+                        "name": device.name,
+                        "start": dt_util.utc_from_timestamp(trip.start).isoformat(),
+                        "end": dt_util.utc_from_timestamp(trip.end).isoformat(),
+                        "duration": trip.duration,
+                        "distance": round(trip.distance),
+                        "max_speed": trip.max_speed,
+                    },
+                )
+        return changed
+
+    async def _async_poll(self) -> MiitownData:
+        """Fetch the device list if needed and the status of all devices."""
+
+        # Follow the dedicated session option without a reload.
+        self._api.session = self._client_session()
+        threshold = self._option(CONF_OFFLOAD_THRESHOLD)
+        self._api.offload = 0 < threshold < len(self._devices or ())
+
+        # Device records are kept and updated in place from one poll to the next.
+        data = self.data or MiitownData()
 
         if not self._devices:
-            self._devices = await self._retrieve_data("fetch_devices")
-
-        device_metas = await self._retrieve_data("fetch_devices_data", self._devices)
-
-        for device_meta in device_metas:
-            data.devices[device_meta["serialNumber"]] = MiitownDevice(
-                device_meta["imei"],
-                device_meta["displayName"],
-                dt_util.utc_from_timestamp(device_meta["lastSeen"]),
-                device_meta["isConnected"],
-                int(device_meta["battery"]),
-                device_meta["isLowPower"],
-                device_meta["isDriving"],
-                float(device_meta["latitude"]),
-                float(device_meta["longitude"]),
-                float(device_meta["height"]),
-                int(device_meta["satellites"]),
-                round(device_meta["speed"], SPEED_DIGITS),
+            self._set_devices(await self._retrieve_data(self._api.fetch_devices))
+        elif (
+                time.monotonic() - self._devices_fetched
+                > DEVICES_REFRESH_INTERVAL.total_seconds()
+        ):
+            # Pick up added and removed devices without holding up this poll.
+            self._devices_fetched = time.monotonic()
+            self.hass.async_create_task(self._async_refresh_devices())
+
+        full_update, self._full_update = self._full_update, False
+        try:
+            device_metas = await self._retrieve_data(
+                self._transport.fetch_devices_data, not full_update
             )
+        except Exception:
+            self._full_update = full_update
+            raise
 
+        await self._async_process_status(data, device_metas, full_update)
         return data
+
+    async def _async_process_status(
+            self, data: MiitownData, device_metas: list[dict] | None, full_update: bool
+    ) -> None:
+        """Update data from a status payload, None if it didn't change."""
+        start = time.perf_counter()
+        time_now = int(time.time())
+        if device_metas is None:
+            # Same payload as last time, only flags can have expired since.
+            self.changed = {
+                serial_number
+                for serial_number, record in data.devices.items()
+                if expire_device(record, time_now, self._device_profile)
+            }
+        else:
+            self.changed = await self._async_update_devices(
+                data, device_metas, time_now, full_update
+            )
+        self.changed |= self._update_trips(data.devices, time_now)
+
+        self._adapt_update_interval(data.devices)
+        self.stale = False
+        self._save_snapshot()
+        self.timings["process"].record(time.perf_counter() - start)
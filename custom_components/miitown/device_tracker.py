@@ -3,69 +3,93 @@
 from __future__ import annotations
 
 from collections.abc import Mapping
+from dataclasses import replace
+from datetime import datetime
+import time
 from typing import Any, cast
 
 from homeassistant.components.device_tracker import SOURCE_TYPE_GPS
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
+from homeassistant.components.zone import ENTITY_ID_HOME
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_BATTERY_CHARGING
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import (
+    ATTR_BATTERY_CHARGING,
+    ATTR_ENTITY_ID,
+    STATE_HOME,
+    STATE_NOT_HOME,
+)
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     ATTR_IMEI,
-    ATTR_IS_CONNECTED,
     ATTR_DRIVING,
-    ATTR_LAST_SEEN,
-    ATTR_IS_LOW_POWER,
     ATTR_SPEED,
     ATTR_HEIGHT,
     ATTRIBUTION,
-    CONF_DRIVING_SPEED,
+    CONF_COORDINATE_DIGITS,
+    CONF_GPS_TOLERANCE,
+    CONF_MAX_WRITE_AGE,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_SPEED_TOLERANCE,
+    DEFAULT_OPTIONS,
     DOMAIN,
-    LOGGER, ATTR_SATELLITES,
+    EVENT_ZONE_ENTER,
+    EVENT_ZONE_LEAVE,
+    LOGGER, ATTR_STALE,
 )
 from .coordinator import MiitownDataUpdateCoordinator, MiitownDevice
-
-_LOC_ATTRS = (
-    "last_seen",
-    "is_connected",
-    "is_driving",
-    "latitude",
-    "longitude",
-    "height",
-    "satellites",
-    "speed",
-)
+from .entity import async_claim_device, async_release_devices
+from .utils import distance
+from .zones import IndexedZone
 
 
 async def async_setup_entry(
         hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up the device tracker platform."""
-    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
-    devices = hass.data[DOMAIN].devices
+    integration = hass.data[DOMAIN]
+    coordinator = integration.coordinators[entry.entry_id]
+    # serial_number: MiitownDeviceTracker
+    entities: dict[str, MiitownDeviceTracker] = {}
+    versions: tuple[int, int] | None = None
 
     @callback
-    def process_data(new_members_only: bool = True) -> None:
+    def process_data() -> None:
         """Process new Miitown data."""
+        nonlocal versions
+        # Look again when the devices or the devices claimed by others changed.
+        if versions == (coordinator.device_set_version, integration.devices_version):
+            return
+
+        # Remove trackers that are no longer on the account.
+        removed = entities.keys() - coordinator.serial_numbers
+        for device_id in removed:
+            entity = entities.pop(device_id)
+            LOGGER.debug("Removed member: %s (%s)", entity.name, entry.unique_id)
+            ent_reg = er.async_get(hass)
+            if entity.entity_id and ent_reg.async_get(entity.entity_id):
+                ent_reg.async_remove(entity.entity_id)
+            else:
+                hass.async_create_task(entity.async_remove())
+        # Another account may still have them.
+        async_release_devices(hass, entry, removed)
+        versions = (coordinator.device_set_version, integration.devices_version)
+
         new_entities = []
         for device_id, device in coordinator.data.devices.items():
-            device_by_entry = devices.get(device_id)
-            if new_member := not device_by_entry:
-                devices[device_id] = entry.entry_id
-                LOGGER.debug("Member: %s (%s)", device.name, entry.unique_id)
-            if (
-                    new_member
-                    or device_by_entry == entry.entry_id
-                    and not new_members_only
-            ):
-                new_entities.append(MiitownDeviceTracker(coordinator, device_id))
+            if device_id in entities or not async_claim_device(hass, entry, device_id):
+                continue
+            LOGGER.debug("Member: %s (%s)", device.name, entry.unique_id)
+            entities[device_id] = MiitownDeviceTracker(coordinator, device_id)
+            new_entities.append(entities[device_id])
         if new_entities:
             async_add_entities(new_entities)
 
-    process_data(new_members_only=False)
+    process_data()
     entry.async_on_unload(coordinator.async_add_listener(process_data))
 
 
@@ -85,8 +109,77 @@ class MiitownDeviceTracker(
         self._attr_unique_id = device_id
 
         self._data: MiitownDevice | None = coordinator.data.devices[device_id]
-        self._prev_data = self._data
         self._attr_name = self._data.name
+        # What was last written to the state machine, for change detection.
+        self._written_data: MiitownDevice | None = replace(self._data)
+        self._written_stale = coordinator.stale
+        self._written_at = time.monotonic()
+        # Retries a write held back by the write policy.
+        self._pending_write: CALLBACK_TYPE | None = None
+        # Zone the device is in, looked up again only when the device moved.
+        self._zone: IndexedZone | None = None
+        self._zone_position: tuple[float, float] | None = None
+        self._written_zone: str | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to updates of this device's data."""
+        # Skip CoordinatorEntity's subscription, which wakes every entity on every
+        # poll; the coordinator only calls back entities whose device changed.
+        await super(CoordinatorEntity, self).async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_device_listener(
+                self._attr_unique_id, self._handle_coordinator_update
+            )
+        )
+        self.async_on_remove(
+            self.hass.data[DOMAIN].zones.async_add_listener(self._handle_zones_update)
+        )
+        self.async_on_remove(self._cancel_pending_write)
+        self._update_zone(fire_events=False)
+        self._written_zone = self._zone_id
+
+    @property
+    def _zone_id(self) -> str | None:
+        """Return the entity id of the zone the device is in."""
+        return self._zone.entity_id if self._zone else None
+
+    @callback
+    def _handle_zones_update(self) -> None:
+        """Look the zone of the device up again after the zones changed."""
+        self._zone_position = None
+        self._update_from_coordinator()
+
+    @callback
+    def _update_zone(self, fire_events: bool = True) -> None:
+        """Update the zone of the device if it moved, firing enter/leave events."""
+        if not self._data:
+            return
+        position = (self._data.latitude, self._data.longitude)
+        if position == self._zone_position:
+            return
+        self._zone_position = position
+        prev_zone = self._zone
+        self._zone = self.hass.data[DOMAIN].zones.active_zone(*position)
+        if not fire_events or self._zone == prev_zone:
+            return
+        if prev_zone:
+            self.hass.bus.async_fire(
+                EVENT_ZONE_LEAVE,
+                {ATTR_ENTITY_ID: self.entity_id, "zone": prev_zone.entity_id},
+            )
+        if self._zone:
+            self.hass.bus.async_fire(
+                EVENT_ZONE_ENTER,
+                {ATTR_ENTITY_ID: self.entity_id, "zone": self._zone.entity_id},
+            )
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available.
+
+        Data restored on startup stays available until the first refresh succeeds.
+        """
+        return super().available or self.coordinator.stale
 
     @property
     def _options(self) -> Mapping[str, Any]:
@@ -96,46 +189,114 @@ class MiitownDeviceTracker(
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
+        start = time.perf_counter()
+        self._update_from_coordinator()
+        self.coordinator.timings["entity_update"].record(time.perf_counter() - start)
+
+    @callback
+    def _update_from_coordinator(self) -> None:
+        """Take over new data and write state if it changed meaningfully."""
         if self.available:
             self._data = self.coordinator.data.devices.get(self._attr_unique_id)
         else:
             self._data = None
+        self._update_zone()
 
-        if self._data:
-            last_seen = self._data.last_seen
-            prev_seen = self._prev_data.last_seen
-            bad_last_seen = last_seen < prev_seen
-            if bad_last_seen:
-                if bad_last_seen:
-                    LOGGER.warning(
-                        "%s: Ignoring location update because "
-                        "last_seen (%s) < previous last_seen (%s)",
-                        self.entity_id,
-                        last_seen,
-                        prev_seen,
-                    )
-                for attr in _LOC_ATTRS:
-                    setattr(self._data, attr, getattr(self._prev_data, attr))
-
-            self._prev_data = self._data
+        if not self._data_changed():
+            self.coordinator.suppressed_writes += 1
+            return
 
+        self._written_data = replace(self._data) if self._data else None
+        self._written_stale = self.coordinator.stale
+        self._written_zone = self._zone_id
+        self._written_at = time.monotonic()
+        self._cancel_pending_write()
         super()._handle_coordinator_update()
 
+    @callback
+    def _schedule_write(self, delay: float) -> None:
+        """Check again for a held back write after delay seconds."""
+        if self._pending_write is None:
+            self._pending_write = async_call_later(
+                self.hass, delay, self._handle_pending_write
+            )
+
+    @callback
+    def _handle_pending_write(self, _now: datetime) -> None:
+        """Write held back data if the write policy allows it by now."""
+        self._pending_write = None
+        self._update_from_coordinator()
+
+    @callback
+    def _cancel_pending_write(self) -> None:
+        """Cancel checking again for a held back write."""
+        if self._pending_write:
+            self._pending_write()
+            self._pending_write = None
+
+    def _data_changed(self) -> bool:
+        """Return True if data differs meaningfully from what was last written.
+
+        Battery, connection and satellite changes alone don't count, the sensors
+        and binary sensors of the device report those instead of the tracker. Moves are written per the write
+        policy: not more often than the minimum interval, and only beyond the
+        tolerances unless the last write is older than the maximum age.
+        """
+        data = self._data
+        prev = self._written_data
+        if not data or not prev:
+            return data is not prev
+        if (
+                data.name != prev.name
+                or data.is_driving != prev.is_driving
+                or self.coordinator.stale != self._written_stale
+                or self._zone_id != self._written_zone
+        ):
+            return True
+
+        digits = self._options.get(
+            CONF_COORDINATE_DIGITS, DEFAULT_OPTIONS[CONF_COORDINATE_DIGITS]
+        )
+        if (
+                data.speed == prev.speed
+                and round(data.latitude, digits) == round(prev.latitude, digits)
+                and round(data.longitude, digits) == round(prev.longitude, digits)
+        ):
+            return False
+        elapsed = time.monotonic() - self._written_at
+        min_interval = self._options.get(
+            CONF_MIN_WRITE_INTERVAL, DEFAULT_OPTIONS[CONF_MIN_WRITE_INTERVAL]
+        )
+        if elapsed < min_interval:
+            self._schedule_write(min_interval - elapsed)
+            return False
+        max_age = self._options.get(
+            CONF_MAX_WRITE_AGE, DEFAULT_OPTIONS[CONF_MAX_WRITE_AGE]
+        )
+        if max_age and elapsed >= max_age:
+            return True
+
+        gps_tolerance = self._options.get(
+            CONF_GPS_TOLERANCE, DEFAULT_OPTIONS[CONF_GPS_TOLERANCE]
+        )
+        speed_tolerance = self._options.get(
+            CONF_SPEED_TOLERANCE, DEFAULT_OPTIONS[CONF_SPEED_TOLERANCE]
+        )
+        if (
+                abs(data.speed - prev.speed) > speed_tolerance
+                or distance(data.latitude, data.longitude, prev.latitude, prev.longitude)
+                > gps_tolerance
+        ):
+            return True
+        if max_age:
+            self._schedule_write(max_age - elapsed)
+        return False
+
     @property
     def force_update(self) -> bool:
         """Return True if state updates should be forced."""
         return False
 
-    @property
-    def battery_level(self) -> int | None:
-        """Return the battery level of the device.
-
-        Percentage from 0-100.
-        """
-        if not self._data:
-            return None
-        return self._data.battery_level
-
     @property
     def source_type(self) -> str:
         """Return the source type, eg gps or router, of the device."""
@@ -146,9 +307,6 @@ class MiitownDeviceTracker(
         """Return if driving."""
         if not self._data:
             return False
-        if (driving_speed := self._options.get(CONF_DRIVING_SPEED)) is not None:
-            if self._data.speed >= driving_speed:
-                return True
         return self._data.is_driving
 
     @property
@@ -156,43 +314,57 @@ class MiitownDeviceTracker(
         """Return a location name for the current location of the device."""
         if self.driving:
             return "Driving"
-        return None
+        if not self._data:
+            return None
+        # Answer from our zone index, so the state machine doesn't scan all zones.
+        if not self._zone:
+            return STATE_NOT_HOME
+        if self._zone.entity_id == ENTITY_ID_HOME:
+            return STATE_HOME
+        return self._zone.name
 
     @property
     def latitude(self) -> float | None:
         """Return latitude value of the device."""
         if not self._data:
             return None
-        return self._data.latitude
+        return round(
+            self._data.latitude,
+            self._options.get(
+                CONF_COORDINATE_DIGITS, DEFAULT_OPTIONS[CONF_COORDINATE_DIGITS]
+            ),
+        )
 
     @property
     def longitude(self) -> float | None:
         """Return longitude value of the device."""
         if not self._data:
             return None
-        return self._data.longitude
+        return round(
+            self._data.longitude,
+            self._options.get(
+                CONF_COORDINATE_DIGITS, DEFAULT_OPTIONS[CONF_COORDINATE_DIGITS]
+            ),
+        )
 
     @property
     def extra_state_attributes(self) -> Mapping[str, Any] | None:
-        """Return entity specific state attributes."""
+        """Return entity specific state attributes.
+
+        Only values that are written when they change, see _data_changed.
+        """
         if not self._data:
             return {
                 ATTR_IMEI: None,
-                ATTR_LAST_SEEN: None,
-                ATTR_IS_CONNECTED: None,
-                ATTR_IS_LOW_POWER: None,
                 ATTR_DRIVING: None,
                 ATTR_HEIGHT: None,
-                ATTR_SATELLITES: None,
                 ATTR_SPEED: None,
+                ATTR_STALE: None,
             }
         return {
             ATTR_IMEI: self._data.imei,
-            ATTR_LAST_SEEN: self._data.last_seen,
-            ATTR_IS_CONNECTED: self._data.is_connected,
-            ATTR_IS_LOW_POWER: self._data.is_low_power,
             ATTR_DRIVING: self.driving,
             ATTR_HEIGHT: self._data.height,
-            ATTR_SATELLITES: self._data.satellites,
             ATTR_SPEED: self._data.speed,
+            ATTR_STALE: self.coordinator.stale,
         }
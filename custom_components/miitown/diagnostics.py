@@ -0,0 +1,47 @@
+"""Diagnostics support for Miitown."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from . import http_helper
+from .const import CONF_AUTHORIZATION, DOMAIN
+
+TO_REDACT = {CONF_AUTHORIZATION, CONF_PASSWORD, CONF_USERNAME, "title", "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+        hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    circuit_breaker = http_helper.circuit_breaker
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "devices": len(coordinator.data.devices) if coordinator.data else 0,
+            "stale": coordinator.stale,
+            "suppressed_writes": coordinator.suppressed_writes,
+            "coalesced_calls": coordinator.coalesced_calls,
+            "timings": {
+                stage: stats.as_dict() for stage, stats in coordinator.timings.items()
+            },
+        },
+        "http": {
+            "circuit_open": circuit_breaker.is_open,
+            "consecutive_failures": circuit_breaker.failures,
+            "dedicated_connections": http_helper.connection_stats.as_dict(),
+            "endpoints": {
+                path: stats.as_dict()
+                for path, stats in http_helper.endpoint_stats.items()
+            },
+        },
+    }
@@ -0,0 +1,163 @@
+"""Base entity for the values of Miitown devices."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import EntityDescription
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import ATTRIBUTION, DOMAIN, LOGGER
+from .coordinator import MiitownDataUpdateCoordinator, MiitownDevice
+
+
+@dataclass
+class MiitownEntityDescriptionMixin:
+    """Mixin for the value of a Miitown device entity."""
+
+    value_fn: Callable[[MiitownDevice], Any]
+
+
+@callback
+def async_claim_device(hass: HomeAssistant, entry: ConfigEntry, device_id: str) -> bool:
+    """Return if the entities of a device belong to a config entry.
+
+    A device on several accounts gets its entities from the first entry that claims
+    it, so their unique IDs don't clash.
+    """
+    devices = hass.data[DOMAIN].devices
+    return devices.setdefault(device_id, entry.entry_id) == entry.entry_id
+
+
+@callback
+def async_release_devices(
+        hass: HomeAssistant, entry: ConfigEntry, device_ids: Iterable[str] | None = None
+) -> None:
+    """Release the devices claimed by a config entry, all of them by default.
+
+    Other entries with these devices claim them on their next poll.
+    """
+    integration = hass.data[DOMAIN]
+    released = [
+        device_id
+        for device_id, entry_id in integration.devices.items()
+        if entry_id == entry.entry_id and (device_ids is None or device_id in device_ids)
+    ]
+    for device_id in released:
+        del integration.devices[device_id]
+    if released:
+        integration.devices_version += 1
+
+
+@callback
+def async_setup_device_entities(
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        async_add_entities: AddEntitiesCallback,
+        create_entities: Callable[
+            [MiitownDataUpdateCoordinator, str], list[MiitownDeviceEntity]
+        ],
+) -> None:
+    """Add the entities of new devices and remove those of removed devices."""
+    integration = hass.data[DOMAIN]
+    coordinator = integration.coordinators[entry.entry_id]
+    # serial_number: entities of the device
+    entities: dict[str, list[MiitownDeviceEntity]] = {}
+    versions: tuple[int, int] | None = None
+
+    @callback
+    def process_data() -> None:
+        """Process new Miitown data."""
+        nonlocal versions
+        # Look again when the devices or the devices claimed by others changed.
+        if versions == (coordinator.device_set_version, integration.devices_version):
+            return
+        versions = (coordinator.device_set_version, integration.devices_version)
+
+        ent_reg = er.async_get(hass)
+        for device_id in entities.keys() - coordinator.serial_numbers:
+            LOGGER.debug("Removing entities of member: %s", device_id)
+            for entity in entities.pop(device_id):
+                if entity.entity_id and ent_reg.async_get(entity.entity_id):
+                    ent_reg.async_remove(entity.entity_id)
+                else:
+                    hass.async_create_task(entity.async_remove())
+
+        new_entities = []
+        for device_id in coordinator.data.devices.keys() - entities.keys():
+            if not async_claim_device(hass, entry, device_id):
+                continue
+            entities[device_id] = create_entities(coordinator, device_id)
+            new_entities.extend(entities[device_id])
+        if new_entities:
+            async_add_entities(new_entities)
+
+    process_data()
+    entry.async_on_unload(coordinator.async_add_listener(process_data))
+
+
+class MiitownDeviceEntity(CoordinatorEntity[MiitownDataUpdateCoordinator]):
+    """Entity for one value of a Miitown device.
+
+    Writes its state only when its own value or availability changed.
+    """
+
+    _attr_attribution = ATTRIBUTION
+    entity_description: MiitownEntityDescriptionMixin
+
+    def __init__(
+            self,
+            coordinator: MiitownDataUpdateCoordinator,
+            device_id: str,
+            description: EntityDescription,
+    ) -> None:
+        """Initialize Miitown device entity."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._device_id = device_id
+        device = coordinator.data.devices[device_id]
+        self._attr_unique_id = f"{device_id}_{description.key}"
+        self._attr_name = f"{device.name} {description.name}"
+        self._value = self._current_value()
+        self._written_state: tuple[bool, Any] | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to updates of this device's data."""
+        # Like the device tracker, listen to this device only.
+        await super(CoordinatorEntity, self).async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_device_listener(
+                self._device_id, self._handle_coordinator_update
+            )
+        )
+        self._written_state = (self.available, self._value)
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return (
+                super().available or self.coordinator.stale
+        ) and self._device_id in self.coordinator.data.devices
+
+    def _current_value(self) -> Any:
+        """Return the value of this entity from the coordinator data."""
+        if not (device := self.coordinator.data.devices.get(self._device_id)):
+            return None
+        return self.entity_description.value_fn(device)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state if the value or the availability changed."""
+        self._value = self._current_value()
+        state = (self.available, self._value)
+        if state == self._written_state:
+            self.coordinator.suppressed_writes += 1
+            return
+        self._written_state = state
+        super()._handle_coordinator_update()
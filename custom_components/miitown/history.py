@@ -0,0 +1,190 @@
+"""Recent location history of Miitown devices."""
+
+from __future__ import annotations
+
+from array import array
+import math
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN, TRACK_SIZE
+from .utils import EARTH_RADIUS
+
+# Point layout: (timestamp, latitude, longitude, speed, height)
+TrackPoint = tuple[float, float, float, float, float]
+
+
+class DeviceTrack:
+    """Ring buffer of the recent positions of a device.
+
+    Values are kept in compact arrays that grow up to size points, after which the
+    oldest points are overwritten.
+    """
+
+    def __init__(self, size: int = TRACK_SIZE) -> None:
+        """Initialize an empty track."""
+        self._size = size
+        self._next = 0
+        self._timestamps = array("d")
+        self._latitudes = array("d")
+        self._longitudes = array("d")
+        self._speeds = array("d")
+        self._heights = array("d")
+
+    def __len__(self) -> int:
+        """Return the number of points in the track."""
+        return len(self._timestamps)
+
+    @property
+    def size(self) -> int:
+        """Return the number of points the track keeps at most."""
+        return self._size
+
+    def resized(self, size: int) -> DeviceTrack:
+        """Return a track of another size holding the most recent points."""
+        track = DeviceTrack(size)
+        for point in self.points()[-size:]:
+            track.append(*point)
+        return track
+
+    def append(
+            self,
+            timestamp: float,
+            latitude: float,
+            longitude: float,
+            speed: float,
+            height: float,
+    ) -> None:
+        """Add a position, unless it is not newer than the last one."""
+        if self._timestamps and timestamp <= self._timestamps[self._next - 1]:
+            return
+        columns = (
+            self._timestamps,
+            self._latitudes,
+            self._longitudes,
+            self._speeds,
+            self._heights,
+        )
+        values = (timestamp, latitude, longitude, speed, height)
+        if len(self._timestamps) < self._size:
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            for column, value in zip(columns, values):
+                column[self._next] = value
+        self._next = (self._next + 1) % self._size
+
+    def points(self, since: float | None = None) -> list[TrackPoint]:
+        """Return the points of the track, oldest first."""
+        start = self._next if len(self._timestamps) == self._size else 0
+        order = [*range(start, len(self._timestamps)), *range(start)]
+        return [
+            (
+                self._timestamps[i],
+                self._latitudes[i],
+                self._longitudes[i],
+                self._speeds[i],
+                self._heights[i],
+            )
+            for i in order
+            if since is None or self._timestamps[i] >= since
+        ]
+
+
+def thin_by_time(points: list[TrackPoint], min_interval: float) -> list[TrackPoint]:
+    """Drop points less than min_interval seconds after the previous kept one."""
+    if min_interval <= 0 or len(points) < 3:
+        return points
+    result = [points[0]]
+    for point in points[1:-1]:
+        if point[0] - result[-1][0] >= min_interval:
+            result.append(point)
+    result.append(points[-1])
+    return result
+
+
+def douglas_peucker(points: list[TrackPoint], tolerance: float) -> list[TrackPoint]:
+    """Simplify a track, keeping its shape within tolerance meters."""
+    if tolerance <= 0 or len(points) < 3:
+        return points
+
+    # Project to a local plane in meters, good enough for the extent of a track.
+    cos_lat = math.cos(math.radians(points[0][1]))
+    xy = [
+        (math.radians(point[2]) * cos_lat * EARTH_RADIUS,
+         math.radians(point[1]) * EARTH_RADIUS)
+        for point in points
+    ]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        max_distance = 0.0
+        index = first
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length:
+                distance = abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+            else:
+                distance = math.hypot(x - x1, y - y1)
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    """Register the websocket command returning the track of a device."""
+    websocket_api.async_register_command(hass, websocket_track)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/track",
+        vol.Required("entity_id"): str,
+        vol.Optional("since"): vol.Coerce(float),
+        vol.Optional("min_interval", default=0): vol.Coerce(float),
+        vol.Optional("tolerance", default=0): vol.Coerce(float),
+    }
+)
+@callback
+def websocket_track(
+        hass: HomeAssistant,
+        connection: websocket_api.ActiveConnection,
+        msg: dict[str, Any],
+) -> None:
+    """Return the recent track of a Miitown device tracker."""
+    entry = er.async_get(hass).async_get(msg["entity_id"])
+    integration_data = hass.data[DOMAIN]
+    if (
+            not entry
+            or entry.platform != DOMAIN
+            or not (entry_id := integration_data.devices.get(entry.unique_id))
+            or not (coordinator := integration_data.coordinators.get(entry_id))
+    ):
+        connection.send_error(
+            msg["id"], websocket_api.const.ERR_NOT_FOUND, "Unknown Miitown entity"
+        )
+        return
+
+    points: list[TrackPoint] = []
+    if track := coordinator.history.get(entry.unique_id):
+        points = thin_by_time(track.points(msg.get("since")), msg["min_interval"])
+        points = douglas_peucker(points, msg["tolerance"])
+    connection.send_result(msg["id"], {"points": points})
@@ -1,14 +1,231 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
 import aiohttp
 from aiohttp import ClientTimeout
 
-DEFAULT_TIMEOUT = ClientTimeout(total=10)
+from .const import MAX_CONCURRENT_REQUESTS
+from .utils import CircuitOpenError, RollingStats
+
+try:
+    # Ships with Home Assistant, decodes straight from bytes and much faster.
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+DEFAULT_TIMEOUT = ClientTimeout(total=15, sock_connect=5, sock_read=10)
+# Extra read time allowed per item of a large response, and its upper bound.
+TIMEOUT_PER_ITEM = 0.01
+MAX_EXTRA_TIMEOUT = 50
+
+# Idempotent requests are retried with jittered exponential backoff.
+GET_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# Stop calling the server for a while after this many failed requests in a row.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 60
+
+# Dedicated connection pool: as many warm connections to miitown.com as requests
+# may run at once, kept open between polls. aiohttp doesn't pipeline requests.
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 300
+
+
+class EndpointStats(RollingStats):
+    def __init__(self):
+        super().__init__()
+        self.retries = 0
+
+    def as_dict(self) -> dict:
+        return {**super().as_dict(), "retries": self.retries}
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.created = 0
+        self.reused = 0
+
+    @property
+    def reuse_rate(self) -> Optional[float]:
+        if not (total := self.created + self.reused):
+            return None
+        return self.reused / total
+
+    def as_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "reuse_rate": self.reuse_rate,
+        }
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        # Once the reset timeout passed, calls go through again (half open) and the
+        # next failure reopens the circuit right away.
+        return (
+            self.opened_at is not None
+            and time.monotonic() - self.opened_at < self.reset_timeout
+        )
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# Returned by a conditional get when the response didn't change since the last one.
+NOT_MODIFIED = object()
+
+
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+# URL path: EndpointStats
+endpoint_stats: dict[str, EndpointStats] = {}
+# Connections of the dedicated session.
+connection_stats = ConnectionStats()
+
+
+async def _on_connection_create_end(session, trace_config_ctx, params):
+    connection_stats.created += 1
+
+
+async def _on_connection_reuseconn(session, trace_config_ctx, params):
+    connection_stats.reused += 1
+
+
+def create_session(ssl_context) -> aiohttp.ClientSession:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    connector = aiohttp.TCPConnector(
+        limit_per_host=MAX_CONCURRENT_REQUESTS,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True,
+        ssl=ssl_context,
+    )
+    return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+
+def scaled_timeout(items: int) -> ClientTimeout:
+    extra = min(items * TIMEOUT_PER_ITEM, MAX_EXTRA_TIMEOUT)
+    return ClientTimeout(
+        total=DEFAULT_TIMEOUT.total + extra,
+        sock_connect=DEFAULT_TIMEOUT.sock_connect,
+        sock_read=DEFAULT_TIMEOUT.sock_read + extra,
+    )
+
+
+async def _request(
+        method,
+        url: str,
+        retries: int,
+        validators=None,
+        timeout=DEFAULT_TIMEOUT,
+        offload=False,
+        **kwargs,
+):
+    if circuit_breaker.is_open:
+        raise CircuitOpenError(f"Not calling {url}, server is failing")
+
+    stats = endpoint_stats.setdefault(urlsplit(url).path, EndpointStats())
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            async with method(url, timeout=timeout, **kwargs) as response:
+                if response.status >= 500:
+                    response.raise_for_status()
+                if validators is None:
+                    result = json_loads(await response.read())
+                else:
+                    result = await _read_if_changed(response, validators, offload)
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            stats.record(time.perf_counter() - start)
+            stats.errors += 1
+            if attempt >= retries or circuit_breaker.is_open:
+                # One failure per request, however many attempts it took.
+                circuit_breaker.record_failure()
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+            stats.retries += 1
+            continue
+
+        stats.record(time.perf_counter() - start)
+        circuit_breaker.record_success()
+        return result
+
+
+def _decode_if_changed(body: bytes, prev_digest: Optional[bytes]):
+    # Without caching headers, a digest of the body still tells repeats apart.
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    if digest == prev_digest:
+        return digest, NOT_MODIFIED
+    return digest, json_loads(body)
+
+
+async def _read_if_changed(
+        response: aiohttp.ClientResponse, validators: dict, offload=False
+):
+    if response.status == 304:
+        return NOT_MODIFIED
+    validators["etag"] = response.headers.get("ETag")
+    validators["last_modified"] = response.headers.get("Last-Modified")
+    body = await response.read()
+    if offload:
+        # Large bodies are hashed and decoded in the executor.
+        digest, result = await asyncio.get_running_loop().run_in_executor(
+            None, _decode_if_changed, body, validators.get("digest")
+        )
+    else:
+        digest, result = _decode_if_changed(body, validators.get("digest"))
+    validators["digest"] = digest
+    return result
+
+
+async def get(
+        session: aiohttp.ClientSession, url: str, headers: object, timeout=DEFAULT_TIMEOUT
+):
+    return await _request(session.get, url, GET_RETRIES, timeout=timeout, headers=headers)
 
 
-async def get(session: aiohttp.ClientSession, url: str, headers: object):
-    async with session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT) as response:
-        return await response.json()
+async def get_if_changed(
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: dict,
+        validators: dict,
+        timeout=DEFAULT_TIMEOUT,
+        offload=False,
+):
+    # validators keeps what identifies the last response; NOT_MODIFIED is returned
+    # when the new one is the same.
+    headers = dict(headers)
+    if etag := validators.get("etag"):
+        headers["If-None-Match"] = etag
+    if last_modified := validators.get("last_modified"):
+        headers["If-Modified-Since"] = last_modified
+    return await _request(
+        session.get, url, GET_RETRIES, validators, timeout, offload, headers=headers
+    )
 
 
 async def post(session: aiohttp.ClientSession, url: str, data: object, headers=None):
-    async with session.post(url, json=data, headers=headers, timeout=DEFAULT_TIMEOUT) as response:
-        return await response.json()
+    return await _request(session.post, url, 0, json=data, headers=headers)
@@ -1,42 +1,173 @@
+import asyncio
+import time
+from typing import Optional
+
 import aiohttp
 
-from .http_helper import get, post
-from .const import BASE_URL, LOGIN_PATH, DEVICES_PATH, STATUS_PATH
-from .utils import format_devices, handle_response, AuthError
+from .http_helper import (
+    DEFAULT_TIMEOUT,
+    NOT_MODIFIED,
+    get,
+    get_if_changed,
+    post,
+    scaled_timeout,
+)
+from .const import BASE_URL, COALESCE_WINDOW, LOGIN_PATH, DEVICES_PATH, STATUS_PATH
+from .utils import handle_response, AuthError
 
 
 class MiitownApi:
-    def __init__(self, session: aiohttp.ClientSession, authorization: dict = None):
-        self._session = session
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            authorization: dict = None,
+            username: str = None,
+            password: str = None,
+            base_url: str = BASE_URL,
+            coalesce_window: float = COALESCE_WINDOW,
+    ):
+        self.session = session
+        self._base_url = base_url
         self._authorization = authorization
+        self._username = username
+        self._password = password
+        self._login_lock = asyncio.Lock()
+        self._status_validators = {}
+        # Decode responses in the executor, for large accounts.
+        self.offload = False
+        # Concurrent identical calls share one request, and its result is reused
+        # for coalesce_window seconds.
+        self._coalesce_window = coalesce_window
+        self._in_flight = {}
+        self._results = {}
+        self.coalesced = 0
+        self._status_timeout = DEFAULT_TIMEOUT
+
+    @property
+    def authorization(self) -> Optional[dict]:
+        return self._authorization
+
+    def set_device_count(self, count: int) -> None:
+        # The status payload grows with the account, so does its timeout.
+        self._status_timeout = scaled_timeout(count)
 
     async def authentication(self, username, password) -> bool:
+        # Logins are shared but never replayed from the cache.
+        return await self._single_flight(
+            (LOGIN_PATH, username, password),
+            self._authentication,
+            username,
+            password,
+            cache=False,
+        )
+
+    async def fetch_devices(self) -> list[dict]:
+        return await self._single_flight(
+            (DEVICES_PATH, self._token_key()), self._fetch_devices
+        )
+
+    async def fetch_devices_data(self, conditional: bool = False) -> Optional[list[dict]]:
+        return await self._single_flight(
+            (STATUS_PATH, self._token_key(), conditional),
+            self._fetch_devices_data,
+            conditional,
+        )
+
+    async def _single_flight(self, key, func, *args, cache=True):
+        if (cached := self._results.get(key)) is not None:
+            if time.monotonic() - cached[0] < self._coalesce_window:
+                self.coalesced += 1
+                return cached[1]
+            del self._results[key]
+
+        if (task := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            task = self._in_flight[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda done: self._flight_done(key, done, cache))
+        # A cancelled caller mustn't cancel the request the others wait for.
+        return await asyncio.shield(task)
+
+    def _flight_done(self, key, task: asyncio.Future, cache: bool) -> None:
+        del self._in_flight[key]
+        if not task.cancelled() and task.exception() is None and cache:
+            self._results[key] = (time.monotonic(), task.result())
+
+    def _token_key(self):
+        return self._authorization and self._authorization["token"]
+
+    async def _authentication(self, username, password):
         login_body = {
             "username": username,
             "password": password,
             "rememberMe": False
         }
-        login_response = await post(self._session, BASE_URL + LOGIN_PATH, login_body)
+        login_response = await post(self.session, self._base_url + LOGIN_PATH, login_body)
         handle_response(login_response)
 
         self._authorization = login_response["data"]
         return login_response["data"]
 
-    async def fetch_devices(self) -> list[dict]:
-        devices_response = await get(self._session, BASE_URL + DEVICES_PATH, {
-            "token": self._get_token()
-        })
-        handle_response(devices_response)
+    async def _fetch_devices(self) -> list[dict]:
+        devices = await self._get_data(DEVICES_PATH)
+        self.set_device_count(len(devices))
+        return devices
+
+    async def _fetch_devices_data(self, conditional: bool) -> Optional[list[dict]]:
+        # With conditional, None means the status didn't change since the last call.
+        validators = self._status_validators if conditional else {}
+        data = await self._get_data(STATUS_PATH, validators, self._status_timeout)
+        self._status_validators = validators
+        return data
+
+    async def _get_data(
+            self, path: str, validators: dict = None, timeout=DEFAULT_TIMEOUT
+    ):
+        token = self._token_key()
+        try:
+            response = await self._get(path, validators, timeout)
+        except AuthError:
+            # The token expired or was revoked; log in again once and retry.
+            await self._relogin(token)
+            response = await self._get(path, validators, timeout)
+
+        if response is NOT_MODIFIED:
+            return None
+        return response["data"]
 
-        return devices_response["data"]
+    async def _get(self, path: str, validators: dict = None, timeout=DEFAULT_TIMEOUT):
+        headers = {"token": self._get_token()}
+        if validators is None:
+            response = await get(self.session, self._base_url + path, headers, timeout)
+        else:
+            response = await get_if_changed(
+                self.session,
+                self._base_url + path,
+                headers,
+                validators,
+                timeout,
+                self.offload,
+            )
+        if response is NOT_MODIFIED:
+            return response
+        try:
+            handle_response(response)
+        except Exception:
+            # Don't let a repeated error response pass as unchanged data.
+            if validators is not None:
+                validators.clear()
+            raise
 
-    async def fetch_devices_data(self, devices) -> list[dict]:
-        devices_response = await get(self._session, BASE_URL + STATUS_PATH, {
-            "token": self._get_token()
-        })
-        handle_response(devices_response)
+        return response
 
-        return format_devices(devices, devices_response["data"])
+    async def _relogin(self, stale_token) -> None:
+        if not self._username or not self._password:
+            raise AuthError("Token is invalid")
+        async with self._login_lock:
+            # Concurrent callers share the login made by whoever got here first.
+            if self._authorization and self._authorization["token"] != stale_token:
+                return
+            await self.authentication(self._username, self._password)
 
     def _get_token(self):
         if not self._authorization:
@@ -0,0 +1,151 @@
+"""Support for Miitown sensors."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    PERCENTAGE,
+    SPEED_KILOMETERS_PER_HOUR,
+    TIME_MILLISECONDS,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import StateType
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .coordinator import MiitownDataUpdateCoordinator
+from .entity import (
+    MiitownDeviceEntity,
+    MiitownEntityDescriptionMixin,
+    async_setup_device_entities,
+)
+
+
+@dataclass
+class MiitownSensorEntityDescription(
+    SensorEntityDescription, MiitownEntityDescriptionMixin
+):
+    """Describes a Miitown device sensor."""
+
+
+SENSORS: tuple[MiitownSensorEntityDescription, ...] = (
+    MiitownSensorEntityDescription(
+        key="battery",
+        name="Battery",
+        device_class=SensorDeviceClass.BATTERY,
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: device.battery_level,
+    ),
+    MiitownSensorEntityDescription(
+        key="speed",
+        name="Speed",
+        icon="mdi:speedometer",
+        native_unit_of_measurement=SPEED_KILOMETERS_PER_HOUR,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: device.speed,
+    ),
+    MiitownSensorEntityDescription(
+        key="satellites",
+        name="Satellites",
+        icon="mdi:satellite-variant",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: device.satellites,
+    ),
+)
+
+
+async def async_setup_entry(
+        hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the sensor platform."""
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    async_add_entities(
+        [
+            MiitownPollDurationSensor(coordinator),
+            MiitownPollErrorsSensor(coordinator),
+        ]
+    )
+    async_setup_device_entities(
+        hass,
+        entry,
+        async_add_entities,
+        lambda coordinator, device_id: [
+            MiitownSensor(coordinator, device_id, description)
+            for description in SENSORS
+        ],
+    )
+
+
+class MiitownSensor(MiitownDeviceEntity, SensorEntity):
+    """Sensor for a value of a Miitown device."""
+
+    entity_description: MiitownSensorEntityDescription
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the value of the device."""
+        return self._value
+
+
+class MiitownDiagnosticSensor(
+    CoordinatorEntity[MiitownDataUpdateCoordinator], SensorEntity
+):
+    """Base class for sensors reporting on the polling of an account."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _key: str
+    _label: str
+
+    def __init__(self, coordinator: MiitownDataUpdateCoordinator) -> None:
+        """Initialize Miitown diagnostic sensor."""
+        super().__init__(coordinator)
+        entry = coordinator.config_entry
+        self._attr_unique_id = f"{entry.unique_id}_{self._key}"
+        self._attr_name = f"Miitown {entry.title} {self._label}"
+
+    @property
+    def available(self) -> bool:
+        """Stay available, failing polls are what these sensors report on."""
+        return True
+
+
+class MiitownPollDurationSensor(MiitownDiagnosticSensor):
+    """Duration of the polls of an account."""
+
+    _attr_native_unit_of_measurement = TIME_MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _key = "poll_duration"
+    _label = "poll duration"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the median poll duration."""
+        if (median := self.coordinator.timings["update"].percentile(50)) is None:
+            return None
+        return round(median * 1000, 1)
+
+
+class MiitownPollErrorsSensor(MiitownDiagnosticSensor):
+    """Number of failed polls of an account."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _key = "poll_errors"
+    _label = "poll errors"
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of failed polls since startup."""
+        return self.coordinator.timings["update"].errors
@@ -0,0 +1,27 @@
+"""Transports delivering the status of Miitown devices."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+
+from .miitown_api import MiitownApi
+
+
+class StatusTransport(ABC):
+    """Source of the status payload of all devices of an account."""
+
+    @abstractmethod
+    async def fetch_devices_data(self, conditional: bool = False) -> list | None:
+        """Fetch the status payload, None if conditional and it didn't change."""
+
+
+class PollingTransport(StatusTransport):
+    """Status fetched by polling the status endpoint."""
+
+    def __init__(self, api: MiitownApi) -> None:
+        """Initialize the transport."""
+        self._api = api
+
+    async def fetch_devices_data(self, conditional: bool = False) -> list | None:
+        """Fetch the status payload, None if conditional and it didn't change."""
+        return await self._api.fetch_devices_data(conditional)
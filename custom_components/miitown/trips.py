@@ -0,0 +1,93 @@
+"""Trip detection for Miitown devices."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .const import DRIVING_GPS_AGE
+from .utils import distance
+
+
+@dataclass
+class Trip:
+    """Trip of a device, aggregated while it is driving."""
+
+    __slots__ = ("start", "end", "distance", "max_speed")
+
+    # GPS times of the first and the last moving position.
+    start: int
+    end: int
+    # In meters.
+    distance: float
+    max_speed: float
+
+    @property
+    def duration(self) -> int:
+        """Return the duration of the trip in seconds."""
+        return self.end - self.start
+
+
+class TripDetector:
+    """Driving state of a device, with hysteresis.
+
+    A trip starts on a fresh position at or above the start speed and ends once no
+    position above the stop speed was seen for the stop time, so short stops (e.g.
+    at traffic lights) don't end it.
+    """
+
+    __slots__ = ("trip", "_gps_time", "_latitude", "_longitude", "_pending_distance")
+
+    def __init__(self) -> None:
+        """Initialize an idle detector."""
+        self.trip: Trip | None = None
+        self._gps_time: int | None = None
+        self._latitude = 0.0
+        self._longitude = 0.0
+        # Distance covered since the last moving position of the trip.
+        self._pending_distance = 0.0
+
+    def update(
+            self,
+            gps_time: int,
+            latitude: float,
+            longitude: float,
+            speed: float,
+            time_now: int,
+            start_speed: float,
+            stop_speed: float,
+            stop_time: int,
+    ) -> Trip | None:
+        """Process the latest position of the device.
+
+        Returns the trip that ended, if any.
+        """
+        new_fix = gps_time != self._gps_time
+        if new_fix and self.trip and self._gps_time is not None:
+            self._pending_distance += distance(
+                self._latitude, self._longitude, latitude, longitude
+            )
+        if new_fix:
+            self._gps_time = gps_time
+            self._latitude = latitude
+            self._longitude = longitude
+
+        if not (trip := self.trip):
+            if (
+                    new_fix
+                    and time_now - gps_time <= DRIVING_GPS_AGE
+                    and speed >= start_speed
+            ):
+                self.trip = Trip(gps_time, gps_time, 0.0, speed)
+                self._pending_distance = 0.0
+            return None
+
+        if new_fix and speed > stop_speed:
+            # Only count the distance up to moving positions, not parked GPS drift.
+            trip.distance += self._pending_distance
+            self._pending_distance = 0.0
+            trip.end = gps_time
+            trip.max_speed = max(trip.max_speed, speed)
+        if time_now - trip.end < stop_time:
+            return None
+        self.trip = None
+        return trip
@@ -1,11 +1,99 @@
-import time
-from typing import Union
+from collections import deque
+import cProfile
+import math
+from typing import NamedTuple, Optional, Union
+
+EARTH_RADIUS = 6371000
+
+
+class DeviceProfile(NamedTuple):
+    # Battery voltage (in 10 mV) read as empty and as full.
+    battery_min: int
+    battery_max: int
+    # Battery percentage at or below which a device is low on power.
+    low_battery: int
+    # Seconds since the last connection before a device counts as disconnected.
+    connection_timeout: int
 
 
 class AuthError(Exception):
     pass
 
 
+class CircuitOpenError(Exception):
+    pass
+
+
+class RollingStats:
+    def __init__(self, window: int = 100):
+        # Only the most recent samples are kept, for percentiles.
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class SharedProfiler:
+    # One profiler for the polls of all accounts: they can overlap, and from Python
+    # 3.12 on a second profiler refuses to start while one is active.
+    def __init__(self):
+        self.profile = None
+        self._users = 0
+
+    def start(self) -> bool:
+        if self._users == 0:
+            if self.profile is None:
+                self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another profiling tool is active, like Home Assistant's profiler.
+                return False
+        self._users += 1
+        return True
+
+    def stop(self) -> None:
+        self._users -= 1
+        if self._users == 0:
+            self.profile.disable()
+
+    def take(self) -> Optional[cProfile.Profile]:
+        # Hand over the profile gathered so far, once no poll is being profiled.
+        if self._users:
+            return None
+        profile, self.profile = self.profile, None
+        return profile
+
+
 def handle_response(response: Union[dict, list]) -> None:
     code = str(response.get("code"))
     if type(response) == list or code == "200":
@@ -15,67 +103,32 @@ def handle_response(response: Union[dict, list]) -> None:
     raise Exception(response["message" if response.get("message") else "msg"])
 
 
-def battery_parse(value: int) -> int:
-    max_val = 410
-    min_val = 340
+def battery_parse(value: int, min_val: int, max_val: int) -> int:
     if value < max_val:
         value = 0 if value < min_val else 100 * (value - min_val) / (max_val - 5 - min_val)
 
     return 100 if value > 100 else int(value)
 
 
-def clone_dict_list(old_list: list[dict]) -> list[dict]:
-    new_list = []
-    for item in old_list:
-        new_list.append(item.copy())
-
-    return new_list
-
-
-def format_devices(devices: list[dict], device_metas: list[dict]):
-    new_devices = []
-    for device in clone_dict_list(devices):
-        for meta in device_metas:
-            should_break = False
-            device["isConnected"] = False
-            device["isLowPower"] = False
-            device["battery"] = 0
-            time_now = int(time.time())
-            if meta.get("conn") is not None and (
-                    meta["conn"]["imei"] == device["imei"] or meta["conn"]["imei"] == device["serialNumber"]):
-                should_break = True
-                if time_now - meta["conn"]["connTime"] <= 900:
-                    device["isConnected"] = True
-                device["lastSeen"] = meta["conn"]["connTime"]
-
-            if meta.get("position") is not None and (
-                    meta["position"]["imei"] == device["imei"] or meta["position"]["imei"] == device["serialNumber"]):
-                should_break = True
-                device["gpsTime"] = meta["position"]["gpsTime"]
-                device["height"] = meta["position"]["high"]
-                device["latitude"] = meta["position"]["lat"]
-                device["longitude"] = meta["position"]["lng"]
-                device["satellites"] = meta["position"]["sates"]
-                device["speed"] = meta["position"]["speed"]
-                device["upMode"] = meta["position"]["upMode"]
-                if time_now - meta["position"]["gpsTime"] <= 60 and meta["position"]["speed"] > 3:
-                    device["isDriving"] = True
-                else:
-                    device["isDriving"] = False
-
-            if meta.get("power") is not None and (
-                    meta["power"]["imei"] == device["imei"] or meta["power"]["imei"] == device["serialNumber"]):
-                should_break = True
-                device["isLowPower"] = False
-                if meta["power"]["po"] != 1:
-                    device["battery"] = battery_parse(meta["power"]["inside"])
-                    if device["battery"] <= 20:
-                        device["isLowPower"] = True
-                else:
-                    device["battery"] = 100
-
-            if should_break:
-                new_devices.append(device)
-                break
-
-    return new_devices
+def distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    # Haversine distance in meters
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def index_device_metas(device_metas: list[dict]) -> dict[str, tuple[int, dict]]:
+    # imei/serial number -> (position, meta) of the first status record that mentions it
+    index = {}
+    for position, meta in enumerate(device_metas):
+        for key in ("conn", "position", "power"):
+            record = meta.get(key)
+            if record is not None and record["imei"] not in index:
+                index[record["imei"]] = (position, meta)
+
+    return index
+
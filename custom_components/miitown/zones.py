@@ -0,0 +1,170 @@
+"""Zone lookups for Miitown devices."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable
+import math
+from typing import NamedTuple
+
+from homeassistant.components.zone import DOMAIN as ZONE_DOMAIN
+from homeassistant.components.zone.const import ATTR_PASSIVE, ATTR_RADIUS
+from homeassistant.const import ATTR_LATITUDE, ATTR_LONGITUDE, STATE_UNAVAILABLE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.event import TrackStates, async_track_state_change_filtered
+
+from .utils import distance
+
+# Size of the grid cells zones are indexed by, in degrees (about 5.5 km).
+GRID_SIZE = 0.05
+# Zones that would cover more cells than this are checked for every lookup instead.
+MAX_ZONE_CELLS = 400
+
+
+class IndexedZone(NamedTuple):
+    """Zone as kept in the index."""
+
+    entity_id: str
+    name: str
+    latitude: float
+    longitude: float
+    radius: float
+    cells: tuple[tuple[int, int], ...]
+
+
+def _cell(latitude: float, longitude: float) -> tuple[int, int]:
+    """Return the grid cell of a position."""
+    return math.floor(latitude / GRID_SIZE), math.floor(longitude / GRID_SIZE)
+
+
+class ZoneIndex:
+    """Grid index of the zones, to find the zone of a position quickly.
+
+    Picks the same zone as zone.async_active_zone: the closest zone the position is
+    in, the smaller one on a tie, ignoring passive and unavailable zones.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        # entity_id: IndexedZone
+        self._zones: dict[str, IndexedZone] = {}
+        self._cells: defaultdict[tuple[int, int], set[str]] = defaultdict(set)
+        # Zones too large for the grid.
+        self._large: set[str] = set()
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Listen for changes to the zones."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove zones listener."""
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_update(self, entity_id: str, state: State | None) -> None:
+        """Add, update or remove (if state is None) a zone.
+
+        Listeners are only called when the zone's name or area changed, not for
+        its state, the number of persons in it.
+        """
+        zone = None
+        if (
+                state is not None
+                and state.state != STATE_UNAVAILABLE
+                and not state.attributes.get(ATTR_PASSIVE)
+        ):
+            zone = (
+                state.name,
+                state.attributes[ATTR_LATITUDE],
+                state.attributes[ATTR_LONGITUDE],
+                state.attributes[ATTR_RADIUS],
+            )
+        if indexed := self._zones.get(entity_id):
+            unchanged = zone == (
+                indexed.name, indexed.latitude, indexed.longitude, indexed.radius
+            )
+        else:
+            unchanged = zone is None
+        if unchanged:
+            return
+
+        self._remove(entity_id)
+        if state is not None and zone is not None:
+            self._add(entity_id, state)
+        for update_callback in self._listeners:
+            update_callback()
+
+    def _remove(self, entity_id: str) -> None:
+        """Remove a zone from the index."""
+        if zone := self._zones.pop(entity_id, None):
+            self._large.discard(entity_id)
+            for cell in zone.cells:
+                self._cells[cell].discard(entity_id)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+
+    def _add(self, entity_id: str, state: State) -> None:
+        """Add a zone to the index."""
+        latitude = state.attributes[ATTR_LATITUDE]
+        longitude = state.attributes[ATTR_LONGITUDE]
+        radius = state.attributes[ATTR_RADIUS]
+        lat_span = math.degrees(radius / 6371000)
+        lng_span = lat_span / max(math.cos(math.radians(latitude)), 0.01)
+        min_lat, min_lng = _cell(latitude - lat_span, longitude - lng_span)
+        max_lat, max_lng = _cell(latitude + lat_span, longitude + lng_span)
+        cells: tuple[tuple[int, int], ...] = ()
+        if (max_lat - min_lat + 1) * (max_lng - min_lng + 1) > MAX_ZONE_CELLS:
+            self._large.add(entity_id)
+        else:
+            cells = tuple(
+                (cell_lat, cell_lng)
+                for cell_lat in range(min_lat, max_lat + 1)
+                for cell_lng in range(min_lng, max_lng + 1)
+            )
+            for cell in cells:
+                self._cells[cell].add(entity_id)
+
+        self._zones[entity_id] = IndexedZone(
+            entity_id, state.name, latitude, longitude, radius, cells
+        )
+
+    def active_zone(self, latitude: float, longitude: float) -> IndexedZone | None:
+        """Return the zone a position is in, if any."""
+        closest = None
+        min_dist = 0.0
+        candidates = self._cells.get(_cell(latitude, longitude), set()) | self._large
+        for entity_id in sorted(candidates):
+            zone = self._zones[entity_id]
+            zone_dist = distance(latitude, longitude, zone.latitude, zone.longitude)
+            if zone_dist >= zone.radius:
+                continue
+            if (
+                    closest is None
+                    or zone_dist < min_dist
+                    or zone_dist == min_dist and zone.radius < closest.radius
+            ):
+                closest = zone
+                min_dist = zone_dist
+        return closest
+
+
+@callback
+def async_setup_zones(hass: HomeAssistant, zones: ZoneIndex) -> CALLBACK_TYPE:
+    """Index the current zones and keep the index up to date."""
+    for state in hass.states.async_all(ZONE_DOMAIN):
+        zones.async_update(state.entity_id, state)
+
+    @callback
+    def zone_changed(event: Event) -> None:
+        """Update the index with a changed zone."""
+        zones.async_update(event.data["entity_id"], event.data.get("new_state"))
+
+    tracker = async_track_state_change_filtered(
+        hass, TrackStates(False, set(), {ZONE_DOMAIN}), zone_changed
+    )
+    return tracker.async_remove
@@ -0,0 +1,31 @@
+"""Tests for the Miitown integration."""
+
+from __future__ import annotations
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.miitown.const import CONF_AUTHORIZATION, DEFAULT_OPTIONS, DOMAIN
+
+
+async def setup_entry(
+        hass: HomeAssistant, options: dict | None = None, username: str = "user"
+) -> MockConfigEntry:
+    """Set up a config entry for an account of the replay server."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=username,
+        title=username,
+        data={
+            CONF_USERNAME: username,
+            CONF_PASSWORD: "password",
+            CONF_AUTHORIZATION: None,
+        },
+        options={**DEFAULT_OPTIONS, **(options or {})},
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
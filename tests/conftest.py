@@ -0,0 +1,34 @@
+"""Fixtures for Miitown tests."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.miitown.miitown_api import MiitownApi
+
+from .replay_server import ReplayServer, generate_fleet
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+@pytest.fixture
+async def replay_server(hass, socket_enabled) -> AsyncGenerator[ReplayServer, None]:
+    """Serve a fleet of 100 devices."""
+    server = ReplayServer(*generate_fleet(100))
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+def miitown_server(enable_custom_integrations, replay_server):
+    """Point the integration at the replay server, and don't jitter polls."""
+    with patch(
+        "custom_components.miitown.coordinator.MiitownApi",
+        partial(MiitownApi, base_url=replay_server.url, coalesce_window=0),
+    ), patch("custom_components.miitown.coordinator.REQUEST_JITTER", 0):
+        yield replay_server
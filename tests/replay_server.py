@@ -0,0 +1,195 @@
+"""Local stand-in for the Miitown server, replaying generated fleets."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+from custom_components.miitown.const import DEVICES_PATH, LOGIN_PATH, STATUS_PATH
+
+# Fleets are spread around this point, about 20 km each way.
+CENTER = (32.08, 34.78)
+SPREAD = 0.2
+
+
+def generate_fleet(
+        size: int, seed: int = 0, now: int | None = None
+) -> tuple[list[dict], list[dict]]:
+    """Return the device list and status records of a fleet, as the server sends them.
+
+    Like the real server, status records name a device by IMEI or serial number,
+    some parts are missing, and some records are repeated.
+    """
+    rnd = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    devices = [
+        {
+            "imei": f"86{index:013d}",
+            "serialNumber": f"SN{index:08d}",
+            "displayName": f"Tracker {index}",
+        }
+        for index in range(size)
+    ]
+    metas = []
+    for device in devices:
+        key = device["imei"] if rnd.random() < 0.5 else device["serialNumber"]
+        meta = {}
+        if rnd.random() < 0.95:
+            meta["conn"] = {"imei": key, "connTime": now - rnd.randint(0, 2000)}
+        if rnd.random() < 0.95:
+            meta["position"] = {
+                "imei": key,
+                "gpsTime": now - rnd.randint(0, 300),
+                "high": rnd.randint(0, 100),
+                "lat": CENTER[0] + rnd.uniform(-SPREAD, SPREAD),
+                "lng": CENTER[1] + rnd.uniform(-SPREAD, SPREAD),
+                "sates": rnd.randint(3, 12),
+                "speed": 0.0,
+                "upMode": 1,
+            }
+        if rnd.random() < 0.9:
+            meta["power"] = {
+                "imei": key,
+                "po": rnd.choice((0, 1)),
+                "inside": rnd.randint(330, 420),
+            }
+        metas.append(meta)
+    rnd.shuffle(metas)
+    if size > 5:
+        # A repeated record, and a later one that loses against the first.
+        metas.append(dict(metas[0]))
+        metas.insert(
+            1, {"power": {"imei": devices[3]["serialNumber"], "po": 1, "inside": 1}}
+        )
+    return devices, metas
+
+
+class ReplayServer:
+    """Serve the login, device list and status paths of a fleet.
+
+    The status body is kept encoded, so serving it doesn't weigh on timings taken
+    in the same event loop.
+    """
+
+    def __init__(
+            self,
+            devices: list[dict],
+            metas: list[dict],
+            etag: bool = False,
+            seed: int = 0,
+    ) -> None:
+        """Initialize the server with a fleet."""
+        self.devices = devices
+        self.metas = metas
+        # Whether status responses carry an ETag and honour If-None-Match.
+        self.etag = etag
+        self.token = "token-1"
+        # path: requests received
+        self.requests: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        # Requests left to fail, with what status and after how long.
+        self._failures = 0
+        self._failure_status = 503
+        self._failure_delay = 0.0
+        self._body = b""
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+        self.encode()
+
+    def encode(self) -> None:
+        """Encode the status records, after changing them in place."""
+        self._body = json.dumps({"code": 200, "data": self.metas}).encode()
+
+    def move(self, fraction: float, now: int | None = None) -> int:
+        """Move a fraction of the devices a bit and return how many moved."""
+        now = int(time.time()) if now is None else now
+        moved = 0
+        for meta in self.metas:
+            if "position" not in meta or self._random.random() >= fraction:
+                continue
+            position = meta["position"]
+            meta["position"] = {
+                **position,
+                "lat": position["lat"] + self._random.uniform(-0.001, 0.001),
+                "lng": position["lng"] + self._random.uniform(-0.001, 0.001),
+                "speed": round(self._random.uniform(0, 30), 1),
+                "gpsTime": now,
+            }
+            if "conn" in meta:
+                meta["conn"] = {**meta["conn"], "connTime": now}
+            moved += 1
+        self.encode()
+        return moved
+
+    def fail(self, count: int, status: int = 503, delay: float = 0) -> None:
+        """Answer the next count requests with an error status, after delay seconds.
+
+        A delay longer than the client's timeout makes the requests time out.
+        """
+        self._failures = count
+        self._failure_status = status
+        self._failure_delay = delay
+
+    def expire_token(self) -> None:
+        """Reject the current token, as the server does after a while."""
+        self.token = f"token-{int(self.token.rsplit('-', 1)[1]) + 1}"
+
+    async def start(self) -> None:
+        """Start serving on a free local port."""
+        app = web.Application(middlewares=[self._count_and_fail])
+        app.router.add_post(LOGIN_PATH, self._login)
+        app.router.add_get(DEVICES_PATH, self._devices)
+        app.router.add_get(STATUS_PATH, self._status)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _count_and_fail(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests[request.path] += 1
+        if self._failures:
+            self._failures -= 1
+            await asyncio.sleep(self._failure_delay)
+            return web.Response(status=self._failure_status)
+        return await handler(request)
+
+    def _authorized(self, request: web.Request) -> bool:
+        return request.headers.get("token") == self.token
+
+    async def _login(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if not body.get("username") or not body.get("password"):
+            return web.json_response({"code": 500, "message": "Bad credentials"})
+        return web.json_response({"code": 200, "data": {"token": self.token}})
+
+    async def _devices(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response({"code": -401, "message": "Token is invalid"})
+        return web.json_response({"code": 200, "data": self.devices})
+
+    async def _status(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response({"code": -401, "message": "Token is invalid"})
+        headers = {}
+        if self.etag:
+            etag = headers["ETag"] = f'"{hashlib.md5(self._body).hexdigest()}"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers=headers)
+        return web.Response(
+            body=self._body, content_type="application/json", headers=headers
+        )
@@ -0,0 +1,93 @@
+"""Tests for the Miitown API client, against the replay server."""
+
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.miitown.const import DEVICES_PATH, LOGIN_PATH, STATUS_PATH
+from custom_components.miitown.miitown_api import MiitownApi
+
+from .replay_server import ReplayServer, generate_fleet
+
+
+def _api(session: aiohttp.ClientSession, server: ReplayServer, **kwargs) -> MiitownApi:
+    kwargs.setdefault("coalesce_window", 0)
+    return MiitownApi(session, None, "user", "password", server.url, **kwargs)
+
+
+async def test_fetch(hass: HomeAssistant, replay_server: ReplayServer) -> None:
+    """Test the device list and status come through as served."""
+    async with aiohttp.ClientSession() as session:
+        api = _api(session, replay_server)
+        await api.authentication("user", "password")
+
+        assert await api.fetch_devices() == replay_server.devices
+        assert await api.fetch_devices_data() == replay_server.metas
+
+
+async def test_conditional_fetch(
+        hass: HomeAssistant, replay_server: ReplayServer
+) -> None:
+    """Test an unchanged status payload is reported as None."""
+    async with aiohttp.ClientSession() as session:
+        api = _api(session, replay_server)
+        await api.authentication("user", "password")
+
+        assert await api.fetch_devices_data(True) == replay_server.metas
+        assert await api.fetch_devices_data(True) is None
+        # A full fetch always returns the payload.
+        assert await api.fetch_devices_data() == replay_server.metas
+
+        replay_server.move(0.5)
+        assert await api.fetch_devices_data(True) == replay_server.metas
+        assert await api.fetch_devices_data(True) is None
+
+
+async def test_conditional_fetch_etag(hass: HomeAssistant, socket_enabled) -> None:
+    """Test the ETag of the status payload is sent back."""
+    server = ReplayServer(*generate_fleet(10), etag=True)
+    await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            api = _api(session, server)
+            await api.authentication("user", "password")
+
+            assert await api.fetch_devices_data(True) == server.metas
+            assert await api.fetch_devices_data(True) is None
+            server.move(1)
+            assert await api.fetch_devices_data(True) == server.metas
+    finally:
+        await server.stop()
+
+
+async def test_relogin(hass: HomeAssistant, replay_server: ReplayServer) -> None:
+    """Test a rejected token is replaced once by a new login."""
+    async with aiohttp.ClientSession() as session:
+        api = _api(session, replay_server)
+        await api.authentication("user", "password")
+        replay_server.expire_token()
+
+        results = await asyncio.gather(api.fetch_devices(), api.fetch_devices_data())
+
+        assert results == [replay_server.devices, replay_server.metas]
+        assert api.authorization == {"token": replay_server.token}
+        assert replay_server.requests[LOGIN_PATH] == 2
+
+
+async def test_coalesce(hass: HomeAssistant, replay_server: ReplayServer) -> None:
+    """Test concurrent identical calls share one request."""
+    async with aiohttp.ClientSession() as session:
+        api = _api(session, replay_server, coalesce_window=1)
+        await api.authentication("user", "password")
+
+        await asyncio.gather(*(api.fetch_devices() for _ in range(5)))
+        await api.fetch_devices()
+        await asyncio.gather(*(api.fetch_devices_data() for _ in range(5)))
+
+        assert replay_server.requests[DEVICES_PATH] == 1
+        assert replay_server.requests[STATUS_PATH] == 1
+        assert api.coalesced == 9
@@ -0,0 +1,27 @@
+"""Check the benchmarks against their baseline."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from benchmarks.baseline import load_baseline, regressions
+from benchmarks.suite import BENCHMARKS, run
+
+BASELINE = load_baseline()
+# Timings depend on the machine, and the full suite takes a while.
+RUN_BENCHMARKS = bool(os.environ.get("MIITOWN_BENCHMARKS"))
+
+
+def test_baseline_covers_benchmarks() -> None:
+    """Test every benchmark has a baseline."""
+    assert BASELINE["results"].keys() == BENCHMARKS.keys()
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="set MIITOWN_BENCHMARKS=1 to run")
+@pytest.mark.parametrize("name", sorted(BENCHMARKS))
+def test_no_regression(name: str, socket_enabled) -> None:
+    """Test a benchmark stays within the tolerance of its baseline, at every size."""
+    sizes = tuple(int(size) for size in BASELINE["results"].get(name, {}))
+    assert not regressions(run([name], sizes), BASELINE)
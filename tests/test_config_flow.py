@@ -0,0 +1,42 @@
+"""Tests for the Miitown config flow."""
+
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import RESULT_TYPE_CREATE_ENTRY, RESULT_TYPE_FORM
+
+from custom_components.miitown.const import (
+    CONF_BATTERY_MAX,
+    CONF_BATTERY_MIN,
+    CONF_LOW_BATTERY,
+)
+
+from . import setup_entry
+from .replay_server import ReplayServer
+
+
+async def test_options_battery_range(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test the battery voltages must leave room for a reading."""
+    entry = await setup_entry(hass)
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    assert result["type"] == RESULT_TYPE_FORM
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {CONF_BATTERY_MIN: 400, CONF_BATTERY_MAX: 405, CONF_LOW_BATTERY: 30},
+    )
+    assert result["type"] == RESULT_TYPE_FORM
+    assert result["errors"] == {"base": "battery_range"}
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {CONF_BATTERY_MIN: 360, CONF_BATTERY_MAX: 420, CONF_LOW_BATTERY: 30},
+    )
+    assert result["type"] == RESULT_TYPE_CREATE_ENTRY
+    assert entry.options[CONF_BATTERY_MIN] == 360
+    assert entry.options[CONF_BATTERY_MAX] == 420
+    assert entry.options[CONF_LOW_BATTERY] == 30
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(entry.entry_id)
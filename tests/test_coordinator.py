@@ -0,0 +1,163 @@
+"""Tests for the Miitown data update coordinator."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+import json
+from unittest.mock import MagicMock, patch
+
+from homeassistant.config_entries import current_entry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import JSONEncoder
+
+from custom_components.miitown.const import (
+    CONF_CONNECTION_TIMEOUT,
+    CONF_LOW_BATTERY,
+    CONF_MEASURE_LOOP_LAG,
+    CONF_OFFLOAD_THRESHOLD,
+    CONF_PROFILE_TICKS,
+    DOMAIN,
+)
+from custom_components.miitown.coordinator import (
+    MiitownDataUpdateCoordinator,
+    merge_status,
+)
+from custom_components.miitown.http_helper import DEFAULT_TIMEOUT, scaled_timeout
+
+from . import setup_entry
+from .replay_server import ReplayServer
+
+PROFILE = "custom_components.miitown.utils.cProfile.Profile"
+LOOP_LAG_INTERVAL = "custom_components.miitown.coordinator.LOOP_LAG_INTERVAL"
+
+
+async def test_profile(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test the requested number of polls is profiled once."""
+    with patch(PROFILE) as profile_class:
+        entry = await setup_entry(hass, {CONF_PROFILE_TICKS: 2})
+        coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+        await coordinator.async_refresh()
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+
+    profile = profile_class.return_value
+    assert profile.enable.call_count == profile.disable.call_count == 2
+    profile.dump_stats.assert_called_once_with(
+        hass.config.path(f"{DOMAIN}_profile_{entry.entry_id}.prof")
+    )
+    assert entry.options[CONF_PROFILE_TICKS] == 0
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_profile_busy(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test polls go on when another profiler is active."""
+    profile = MagicMock()
+    profile.enable.side_effect = ValueError("Another profiling tool is already active")
+    with patch(PROFILE, return_value=profile):
+        entry = await setup_entry(hass, {CONF_PROFILE_TICKS: 1})
+        coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+        await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    profile.disable.assert_not_called()
+    profile.dump_stats.assert_not_called()
+    assert entry.options[CONF_PROFILE_TICKS] == 1
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_loop_lag(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test the loop lag is only sampled when asked for."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    await coordinator.async_refresh()
+    assert "loop_lag" not in coordinator.timings
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    entry = await setup_entry(hass, {CONF_MEASURE_LOOP_LAG: True}, username="other")
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    with patch(LOOP_LAG_INTERVAL, 0.001):
+        await coordinator.async_refresh()
+    assert coordinator.timings["loop_lag"].count
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_offload(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test status processed in the executor comes out as processed in the loop."""
+    inline = await setup_entry(hass, {CONF_OFFLOAD_THRESHOLD: 0})
+    offloaded = await setup_entry(
+        hass, {CONF_OFFLOAD_THRESHOLD: 10}, username="other"
+    )
+    coordinators = hass.data[DOMAIN].coordinators
+    merges = []
+
+    def merge(*args):
+        """Check the live records are left alone while merging a copy."""
+        records = args[1]
+        before = [replace(record) for record in records.values()]
+        result = merge_status(*args)
+        merges.append((args[-1], before == list(records.values())))
+        return result
+
+    for _ in range(3):
+        miitown_server.move(0.5)
+        with patch("custom_components.miitown.coordinator.merge_status", merge):
+            await coordinators[offloaded.entry_id].async_refresh()
+        await coordinators[inline.entry_id].async_refresh()
+
+        assert coordinators[offloaded.entry_id].last_update_success
+        assert coordinators[offloaded.entry_id].changed == (
+            coordinators[inline.entry_id].changed
+        )
+        assert coordinators[offloaded.entry_id].data.devices == (
+            coordinators[inline.entry_id].data.devices
+        )
+
+    assert merges == [(True, True)] * 3
+    assert await hass.config_entries.async_unload(offloaded.entry_id)
+    assert await hass.config_entries.async_unload(inline.entry_id)
+
+
+async def test_snapshot_status_timeout(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test the status timeout is sized for the device list of a snapshot."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    # As saved and loaded by the store.
+    snapshot = json.loads(json.dumps(coordinator._snapshot(), cls=JSONEncoder))
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    current_entry.set(entry)
+    coordinator = MiitownDataUpdateCoordinator(hass, entry)
+    assert coordinator._api._status_timeout == DEFAULT_TIMEOUT
+    with patch.object(coordinator._store, "async_load", return_value=snapshot):
+        assert await coordinator.async_load_snapshot()
+
+    assert coordinator._api._status_timeout == scaled_timeout(
+        len(miitown_server.devices)
+    )
+
+
+async def test_device_thresholds(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test the battery and connection thresholds come from the options."""
+    entry = await setup_entry(hass)
+    devices = hass.data[DOMAIN].coordinators[entry.entry_id].data.devices
+    draining = [
+        device for device in devices.values() if 0 < device.battery_level < 100
+    ]
+    assert draining
+    assert not all(device.is_low_power for device in draining)
+    assert any(device.is_connected for device in devices.values())
+
+    # Applied to all devices, also those whose status didn't change.
+    hass.config_entries.async_update_entry(
+        entry,
+        options={**entry.options, CONF_CONNECTION_TIMEOUT: 0, CONF_LOW_BATTERY: 100},
+    )
+    await hass.async_block_till_done()
+
+    assert not any(device.is_connected for device in devices.values())
+    assert all(device.is_low_power for device in draining)
+    assert await hass.config_entries.async_unload(entry.entry_id)
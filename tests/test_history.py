@@ -0,0 +1,133 @@
+"""Tests for the Miitown location history."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from homeassistant.components.device_tracker import DOMAIN as DEVICE_TRACKER_DOMAIN
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.miitown.const import DOMAIN
+from custom_components.miitown.history import (
+    DeviceTrack,
+    douglas_peucker,
+    thin_by_time,
+)
+
+from . import setup_entry
+from .replay_server import ReplayServer
+
+
+def _point(timestamp: float, latitude: float = 32.0, longitude: float = 34.0):
+    return (timestamp, latitude, longitude, 10.0, 50.0)
+
+
+def test_track_wraparound() -> None:
+    """Test a full track overwrites its oldest points."""
+    track = DeviceTrack(3)
+    for timestamp in range(1, 6):
+        track.append(*_point(timestamp))
+    # Not newer than the last point.
+    track.append(*_point(5, 33.0))
+
+    assert len(track) == 3
+    assert track.points() == [_point(3), _point(4), _point(5)]
+    assert track.points(since=4) == [_point(4), _point(5)]
+
+
+def test_track_resized() -> None:
+    """Test a resized track keeps the most recent points."""
+    track = DeviceTrack(3)
+    for timestamp in range(1, 6):
+        track.append(*_point(timestamp))
+
+    smaller = track.resized(2)
+    assert smaller.size == 2
+    assert smaller.points() == [_point(4), _point(5)]
+
+    larger = track.resized(5)
+    larger.append(*_point(6))
+    larger.append(*_point(7))
+    assert larger.points() == [_point(timestamp) for timestamp in range(3, 8)]
+
+
+def test_thin_by_time() -> None:
+    """Test points too close in time to the previous kept one are dropped."""
+    points = [_point(timestamp) for timestamp in (0, 10, 20, 50, 55, 58)]
+
+    assert thin_by_time(points, 0) == points
+    # The last point is always kept.
+    assert thin_by_time(points, 30) == [_point(0), _point(50), _point(58)]
+
+
+def test_douglas_peucker() -> None:
+    """Test points within tolerance of the simplified line are dropped."""
+    # About 1 m off a straight line of 330 m, then a 100 m detour.
+    line = [
+        _point(i, 32.0 + i * 0.001, 34.0 + (0.00001 if i % 2 else 0)) for i in range(4)
+    ]
+    detour = _point(4, 32.0035, 34.001)
+    end = _point(5, 32.004, 34.0)
+
+    assert douglas_peucker(line, 0) == line
+    assert douglas_peucker(line, 5) == [line[0], line[-1]]
+    assert douglas_peucker([*line, detour, end], 5) == [line[0], line[-1], detour, end]
+
+
+async def test_track_size_cap(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test large accounts keep shorter tracks."""
+    with patch("custom_components.miitown.coordinator.MAX_TRACK_POINTS", 1000):
+        entry = await setup_entry(hass)
+        coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+        miitown_server.move(1)
+        await coordinator.async_refresh()
+
+    sizes = {track.size for track in coordinator.history.values()}
+    assert sizes == {1000 // len(miitown_server.devices)}
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_websocket_track(
+        hass: HomeAssistant, miitown_server: ReplayServer, hass_ws_client
+) -> None:
+    """Test the track command returns the positions of a device tracker."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    miitown_server.move(1)
+    await coordinator.async_refresh()
+    serial_number, track = next(
+        (serial_number, track)
+        for serial_number, track in coordinator.history.items()
+        if len(track) == 2
+    )
+    entity_id = er.async_get(hass).async_get_entity_id(
+        DEVICE_TRACKER_DOMAIN, DOMAIN, serial_number
+    )
+    client = await hass_ws_client(hass)
+
+    await client.send_json({"id": 1, "type": f"{DOMAIN}/track", "entity_id": entity_id})
+    msg = await client.receive_json()
+    assert msg["success"]
+    assert msg["result"]["points"] == [list(point) for point in track.points()]
+
+    await client.send_json(
+        {
+            "id": 2,
+            "type": f"{DOMAIN}/track",
+            "entity_id": entity_id,
+            "since": track.points()[1][0],
+        }
+    )
+    msg = await client.receive_json()
+    assert msg["result"]["points"] == [list(track.points()[1])]
+
+    await client.send_json(
+        {"id": 3, "type": f"{DOMAIN}/track", "entity_id": "device_tracker.unknown"}
+    )
+    msg = await client.receive_json()
+    assert not msg["success"]
+    assert msg["error"]["code"] == "not_found"
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,107 @@
+"""Tests for the retries and circuit breaker of http_helper, on the replay server."""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import ClientTimeout
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.miitown import http_helper
+from custom_components.miitown.const import DEVICES_PATH
+from custom_components.miitown.http_helper import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    GET_RETRIES,
+    CircuitBreaker,
+)
+from custom_components.miitown.utils import CircuitOpenError
+
+from .replay_server import ReplayServer
+
+
+@pytest.fixture(autouse=True)
+def circuit_breaker() -> Generator[CircuitBreaker, None, None]:
+    """Give each test its own circuit breaker and endpoint stats, and don't back off."""
+    breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+    with patch.object(http_helper, "circuit_breaker", breaker), patch.dict(
+        http_helper.endpoint_stats, clear=True
+    ), patch.object(http_helper, "RETRY_BACKOFF", 0):
+        yield breaker
+
+
+async def _get(
+        session: aiohttp.ClientSession, server: ReplayServer, **kwargs
+) -> dict:
+    return await http_helper.get(
+        session, server.url + DEVICES_PATH, {"token": server.token}, **kwargs
+    )
+
+
+async def test_retry(
+        hass: HomeAssistant, replay_server: ReplayServer, circuit_breaker
+) -> None:
+    """Test a GET is retried on server errors and timeouts."""
+    async with aiohttp.ClientSession() as session:
+        replay_server.fail(GET_RETRIES)
+        assert (await _get(session, replay_server))["data"] == replay_server.devices
+
+        replay_server.fail(1, delay=0.5)
+        result = await _get(session, replay_server, timeout=ClientTimeout(total=0.1))
+        assert result["data"] == replay_server.devices
+
+    stats = http_helper.endpoint_stats[DEVICES_PATH]
+    assert stats.retries == stats.errors == GET_RETRIES + 1
+    # Each failed attempt, and the two that succeeded.
+    assert replay_server.requests[DEVICES_PATH] == GET_RETRIES + 1 + 2
+    assert circuit_breaker.failures == 0
+
+
+async def test_retries_exhausted(
+        hass: HomeAssistant, replay_server: ReplayServer, circuit_breaker
+) -> None:
+    """Test a request failing every attempt counts as one failure."""
+    async with aiohttp.ClientSession() as session:
+        replay_server.fail(GET_RETRIES + 1, status=500)
+        with pytest.raises(aiohttp.ClientResponseError):
+            await _get(session, replay_server)
+
+    assert replay_server.requests[DEVICES_PATH] == GET_RETRIES + 1
+    assert circuit_breaker.failures == 1
+    assert not circuit_breaker.is_open
+
+
+async def test_circuit_breaker(
+        hass: HomeAssistant, replay_server: ReplayServer, circuit_breaker
+) -> None:
+    """Test the circuit opens after failed requests, and half opens after a while."""
+    async with aiohttp.ClientSession() as session:
+        replay_server.fail(CIRCUIT_FAILURE_THRESHOLD * (GET_RETRIES + 1))
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+            with pytest.raises(aiohttp.ClientResponseError):
+                await _get(session, replay_server)
+        assert circuit_breaker.is_open
+
+        # Open: the server isn't called.
+        requests = replay_server.requests[DEVICES_PATH]
+        with pytest.raises(CircuitOpenError):
+            await _get(session, replay_server)
+        assert replay_server.requests[DEVICES_PATH] == requests
+
+        # Half open: one more failed request opens it again right away.
+        circuit_breaker.opened_at -= CIRCUIT_RESET_TIMEOUT
+        assert not circuit_breaker.is_open
+        replay_server.fail(GET_RETRIES + 1)
+        with pytest.raises(aiohttp.ClientResponseError):
+            await _get(session, replay_server)
+        assert circuit_breaker.is_open
+
+        # Half open: a successful request closes it.
+        circuit_breaker.opened_at -= CIRCUIT_RESET_TIMEOUT
+        assert (await _get(session, replay_server))["data"] == replay_server.devices
+        assert circuit_breaker.failures == 0
+        assert not circuit_breaker.is_open
@@ -0,0 +1,206 @@
+"""Tests for the Miitown integration, replaying a fleet end to end."""
+
+from __future__ import annotations
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.components.binary_sensor import DOMAIN as BINARY_SENSOR_DOMAIN
+from homeassistant.components.device_tracker import DOMAIN as DEVICE_TRACKER_DOMAIN
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE, EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant
+from homeassistant.helpers import entity_registry as er
+import homeassistant.util.dt as dt_util
+
+from custom_components.miitown.const import (
+    CONF_MIN_WRITE_INTERVAL,
+    DOMAIN,
+    SNAPSHOT_SAVE_DELAY,
+    STATUS_PATH,
+)
+
+from . import setup_entry
+from .replay_server import ReplayServer
+
+
+async def _replay(
+        hass: HomeAssistant, server: ReplayServer, entry: ConfigEntry, polls: int
+) -> int:
+    """Move 10% of the fleet before each poll, return the tracker state writes."""
+    writes = 0
+
+    def count(event: Event) -> None:
+        nonlocal writes
+        if event.data["entity_id"].startswith(f"{DEVICE_TRACKER_DOMAIN}."):
+            writes += 1
+
+    remove = hass.bus.async_listen(EVENT_STATE_CHANGED, count)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    for _ in range(polls):
+        server.move(0.1)
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+    remove()
+    return writes
+
+
+async def test_setup_entry(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test a tracker is set up for every device with a status."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+
+    assert coordinator.serial_numbers == {
+        device["serialNumber"] for device in miitown_server.devices
+    }
+    assert len(hass.states.async_entity_ids(DEVICE_TRACKER_DOMAIN)) == len(
+        coordinator.data.devices
+    )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_shared_devices(
+        hass: HomeAssistant, miitown_server: ReplayServer, caplog
+) -> None:
+    """Test devices on two accounts get their entities from the first one only."""
+    first = await setup_entry(hass)
+    second = await setup_entry(hass, username="other")
+    devices = hass.data[DOMAIN].coordinators[first.entry_id].data.devices
+
+    assert "does not generate unique IDs" not in caplog.text
+    ent_reg = er.async_get(hass)
+    assert {
+        entity.unique_id
+        for entity in er.async_entries_for_config_entry(ent_reg, second.entry_id)
+    } == {"other_poll_duration", "other_poll_errors"}
+    assert len(hass.states.async_entity_ids(DEVICE_TRACKER_DOMAIN)) == len(devices)
+    # Battery, speed and satellites, and connected and low power.
+    assert len(hass.states.async_entity_ids(SENSOR_DOMAIN)) == 3 * len(devices)
+    assert len(hass.states.async_entity_ids(BINARY_SENSOR_DOMAIN)) == 2 * len(devices)
+
+    assert await hass.config_entries.async_unload(second.entry_id)
+    assert await hass.config_entries.async_unload(first.entry_id)
+
+
+async def test_shared_devices_handover(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test the devices of a removed account are taken over by the other one."""
+    first = await setup_entry(hass)
+    second = await setup_entry(hass, username="other")
+    devices = hass.data[DOMAIN].coordinators[second.entry_id].data.devices
+
+    assert await hass.config_entries.async_remove(first.entry_id)
+    await hass.async_block_till_done()
+    assert not hass.states.async_entity_ids(DEVICE_TRACKER_DOMAIN)
+
+    await hass.data[DOMAIN].coordinators[second.entry_id].async_refresh()
+    await hass.async_block_till_done()
+
+    assert set(hass.data[DOMAIN].devices.values()) == {second.entry_id}
+    assert len(hass.states.async_entity_ids(DEVICE_TRACKER_DOMAIN)) == len(devices)
+    assert len(hass.states.async_entity_ids(SENSOR_DOMAIN)) == 3 * len(devices)
+    assert len(hass.states.async_entity_ids(BINARY_SENSOR_DOMAIN)) == 2 * len(devices)
+    assert await hass.config_entries.async_unload(second.entry_id)
+
+
+async def test_power_change(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test a power-only change reaches the sensors, and the tracker doesn't show it."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    meta = next(
+        meta
+        for meta in miitown_server.metas
+        if meta.keys() >= {"conn", "position", "power"} and meta["power"]["po"] == 0
+    )
+    serial_number = next(
+        device["serialNumber"]
+        for device in miitown_server.devices
+        if meta["power"]["imei"] in (device["imei"], device["serialNumber"])
+    )
+    ent_reg = er.async_get(hass)
+    tracker = ent_reg.async_get_entity_id(DEVICE_TRACKER_DOMAIN, DOMAIN, serial_number)
+    battery = ent_reg.async_get_entity_id(
+        SENSOR_DOMAIN, DOMAIN, f"{serial_number}_battery"
+    )
+    written = hass.states.get(tracker)
+
+    inside = 405 if meta["power"]["inside"] < 375 else 345
+    meta["power"] = {**meta["power"], "inside": inside}
+    miitown_server.encode()
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    level = coordinator.data.devices[serial_number].battery_level
+    assert hass.states.get(battery).state == str(level)
+    assert hass.states.get(tracker) == written
+    assert not written.attributes.keys() & {
+        "battery_level", "is_connected", "is_low_power", "last_seen", "satellites"
+    }
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_unchanged_poll(
+        hass: HomeAssistant, miitown_server: ReplayServer
+) -> None:
+    """Test a poll returning the same status changes no device."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert miitown_server.requests[STATUS_PATH] == 2
+    assert not coordinator.changed
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_snapshot(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test the next startup sets up the trackers from the snapshot."""
+    entry = await setup_entry(hass)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    devices = coordinator.data.devices
+    # Saved on unload.
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    assert coordinator.data.devices == devices
+    await hass.async_block_till_done()
+
+    assert not coordinator.stale
+    assert len(hass.states.async_entity_ids(DEVICE_TRACKER_DOMAIN)) == len(devices)
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_remove_snapshot(
+        hass: HomeAssistant, miitown_server: ReplayServer, hass_storage
+) -> None:
+    """Test the snapshot of a removed entry isn't written again afterwards."""
+    entry = await setup_entry(hass)
+    key = f"{DOMAIN}.{entry.entry_id}"
+    assert key not in hass_storage
+
+    assert await hass.config_entries.async_remove(entry.entry_id)
+    async_fire_time_changed(hass, dt_util.utcnow() + SNAPSHOT_SAVE_DELAY)
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_FINAL_WRITE)
+    await hass.async_block_till_done()
+
+    assert key not in hass_storage
+
+
+async def test_write_policy(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test the minimum write interval cuts the tracker state writes of a replay."""
+    entry = await setup_entry(hass)
+    writes = await _replay(hass, miitown_server, entry, 5)
+    assert writes
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.config_entries.async_remove(entry.entry_id)
+
+    entry = await setup_entry(hass, {CONF_MIN_WRITE_INTERVAL: 60})
+    throttled_writes = await _replay(hass, miitown_server, entry, 5)
+
+    assert throttled_writes < writes
+    assert await hass.config_entries.async_unload(entry.entry_id)
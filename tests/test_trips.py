@@ -0,0 +1,159 @@
+"""Tests for the Miitown trip detection."""
+
+from __future__ import annotations
+
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+
+from custom_components.miitown.const import (
+    CONF_DRIVING_SPEED,
+    CONF_STOP_SPEED,
+    CONF_STOP_TIME,
+    DOMAIN,
+    DRIVING_GPS_AGE,
+    EVENT_TRIP,
+)
+from custom_components.miitown.trips import TripDetector
+from custom_components.miitown.utils import distance
+
+from . import setup_entry
+from .replay_server import ReplayServer
+
+START_SPEED = 10.0
+STOP_SPEED = 1.0
+STOP_TIME = 180
+NOW = 1_700_000_000
+# About 111 m apart.
+A = (32.0, 34.0)
+B = (32.001, 34.0)
+C = (32.002, 34.0)
+
+
+def _update(
+        detector: TripDetector,
+        gps_time: int,
+        position: tuple[float, float],
+        speed: float,
+        time_now: int | None = None,
+):
+    return detector.update(
+        gps_time,
+        *position,
+        speed,
+        gps_time if time_now is None else time_now,
+        START_SPEED,
+        STOP_SPEED,
+        STOP_TIME,
+    )
+
+
+def test_trip_start() -> None:
+    """Test a trip starts on a fresh position at or above the start speed."""
+    detector = TripDetector()
+    assert _update(detector, NOW, A, START_SPEED - 1) is None
+    assert detector.trip is None
+    # Too old to count as driving now.
+    _update(detector, NOW + 1, A, START_SPEED, NOW + 2 + DRIVING_GPS_AGE)
+    assert detector.trip is None
+
+    _update(detector, NOW + 100, A, START_SPEED)
+    assert detector.trip is not None
+    assert detector.trip.start == detector.trip.end == NOW + 100
+    assert detector.trip.max_speed == START_SPEED
+    # The same position again doesn't start or extend anything.
+    _update(detector, NOW + 100, A, START_SPEED, NOW + 110)
+    assert detector.trip.end == NOW + 100
+
+
+def test_short_stop() -> None:
+    """Test stopping for less than the stop time doesn't end the trip."""
+    detector = TripDetector()
+    _update(detector, NOW, A, 50)
+    assert _update(detector, NOW + 60, B, 0) is None
+    assert _update(detector, NOW + 60, B, 0, NOW + STOP_TIME - 1) is None
+    assert detector.trip is not None
+
+    _update(detector, NOW + STOP_TIME, C, 30)
+    assert detector.trip.end == NOW + STOP_TIME
+
+
+def test_trip_end() -> None:
+    """Test a trip ends once no moving position was seen for the stop time."""
+    detector = TripDetector()
+    _update(detector, NOW, A, 50)
+    _update(detector, NOW + 60, B, 40)
+    assert _update(detector, NOW + 120, B, 0, NOW + 60 + STOP_TIME - 1) is None
+
+    trip = _update(detector, NOW + 120, B, 0, NOW + 60 + STOP_TIME)
+    assert trip is not None
+    assert (trip.start, trip.end, trip.duration) == (NOW, NOW + 60, 60)
+    assert detector.trip is None
+
+
+def test_distance_and_max_speed() -> None:
+    """Test the distance counts up to moving positions, not parked drift."""
+    detector = TripDetector()
+    _update(detector, NOW, A, 20)
+    _update(detector, NOW + 10, B, 70)
+    _update(detector, NOW + 20, C, 40)
+    # Drifting while parked.
+    _update(detector, NOW + 30, B, 0)
+    _update(detector, NOW + 40, C, 0)
+
+    trip = _update(detector, NOW + 50, C, 0, NOW + 20 + STOP_TIME)
+    assert trip.distance == distance(*A, *B) + distance(*B, *C)
+    assert trip.max_speed == 70
+
+
+async def test_trip_event(hass: HomeAssistant, miitown_server: ReplayServer) -> None:
+    """Test an ended trip fires an event with its summary."""
+    entry = await setup_entry(
+        hass, {CONF_DRIVING_SPEED: 10.0, CONF_STOP_SPEED: 1.0, CONF_STOP_TIME: 10}
+    )
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    events = async_capture_events(hass, EVENT_TRIP)
+    meta = next(
+        meta for meta in miitown_server.metas if meta.keys() >= {"conn", "position"}
+    )
+    device = next(
+        device
+        for device in miitown_server.devices
+        if meta["position"]["imei"] in (device["imei"], device["serialNumber"])
+    )
+    now = int(dt_util.utcnow().timestamp())
+
+    def drive(gps_time: int, latitude: float, speed: float) -> None:
+        meta["position"] = {
+            **meta["position"],
+            "gpsTime": gps_time,
+            "lat": latitude,
+            "lng": A[1],
+            "speed": speed,
+        }
+        miitown_server.encode()
+
+    drive(now - 40, A[0], 50)
+    await coordinator.async_refresh()
+    assert coordinator.data.devices[device["serialNumber"]].is_driving
+    assert not events
+
+    # Moved on, and last moved longer than the stop time ago.
+    drive(now - 30, B[0], 72.5)
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert not coordinator.data.devices[device["serialNumber"]].is_driving
+    assert len(events) == 1
+    assert events[0].data == {
+        "serial_number": device["serialNumber"],
+        "imei": device["imei"],
+        "name": device["displayName"],
+        "start": dt_util.utc_from_timestamp(now - 40).isoformat(),
+        "end": dt_util.utc_from_timestamp(now - 30).isoformat(),
+        "duration": 10,
+        "distance": round(distance(*A, *B)),
+        "max_speed": 72.5,
+    }
+    assert await hass.config_entries.async_unload(entry.entry_id)
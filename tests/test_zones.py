@@ -0,0 +1,49 @@
+"""Tests for the Miitown zone index."""
+
+from __future__ import annotations
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+
+from custom_components.miitown.const import DOMAIN
+from custom_components.miitown.zones import ZoneIndex
+
+ZONE = {"latitude": 32.1, "longitude": 34.8, "radius": 100, "passive": False}
+
+
+async def test_zone_changes(hass: HomeAssistant, enable_custom_integrations) -> None:
+    """Test listeners are called when a zone's area changes, not its persons."""
+    hass.states.async_set("zone.work", "0", {**ZONE, "friendly_name": "Work"})
+    assert await async_setup_component(hass, DOMAIN, {})
+    zones: ZoneIndex = hass.data[DOMAIN].zones
+    calls = []
+    zones.async_add_listener(lambda: calls.append(None))
+    assert zones.active_zone(32.1, 34.8).entity_id == "zone.work"
+
+    hass.states.async_set(
+        "zone.work", "2", {**ZONE, "friendly_name": "Work", "persons": ["person.a"]}
+    )
+    await hass.async_block_till_done()
+    assert not calls
+
+    hass.states.async_set("zone.work", "2", {**ZONE, "radius": 10})
+    await hass.async_block_till_done()
+    assert len(calls) == 1
+    assert zones.active_zone(32.1, 34.8002) is None
+
+    hass.states.async_set("zone.work", "2", {**ZONE, "radius": 10, "passive": True})
+    await hass.async_block_till_done()
+    assert len(calls) == 2
+    assert zones.active_zone(32.1, 34.8) is None
+
+    hass.states.async_remove("zone.work")
+    await hass.async_block_till_done()
+    assert len(calls) == 2
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+    hass.states.async_set("zone.home", "0", ZONE)
+    await hass.async_block_till_done()
+    assert len(calls) == 2
+    assert zones.active_zone(32.1, 34.8) is None